@@ -0,0 +1,109 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+
+
+class LRUCache:
+    """
+        Thread safe least recently used cache, bounded by number of entries and optionally by memory
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = None):
+        """
+            Args:
+                max_entries (int): maximum number of values kept
+                max_bytes (int): maximum estimated memory of the values kept, None for no memory limit
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.current_bytes = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def size_of(value) -> int:
+        """
+            Estimates the memory used by a value, pandas objects include the strings they hold
+
+            Args:
+                value: any value
+
+            Returns:
+                int with the size in bytes
+        """
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=True))
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(LRUCache.size_of(item) for item in value.values())
+        return sys.getsizeof(value)
+
+    def get(self, key) -> tuple:
+        """
+            Looks a key up and marks it as the most recently used
+
+            Args:
+                key: hashable key
+
+            Returns:
+                tuple (found, value), value is None when the key is not in the cache
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return True, self.__entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value) -> None:
+        """
+            Stores a value, evicting the least recently used ones until the cache is within its bounds.
+            Values bigger than max_bytes are not stored.
+
+            Args:
+                key: hashable key
+                value: value to store
+        """
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__entries:
+                self.current_bytes -= self.__entries.pop(key)[1]
+            self.__entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self.__entries) > self.max_entries or (self.max_bytes is not None and self.current_bytes > self.max_bytes):
+                self.current_bytes -= self.__entries.popitem(last=False)[1][1]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+def cached_query(method):
+    """
+        Memoizes a Data method in its query_cache, keyed on the method name, the arguments and the data_version of the instance.
+        Calls with unhashable arguments are not cached. The cached results are shared, they must not be modified.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self.data_version)
+        try:
+            found, value = self.query_cache.get(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        if not found:
+            value = method(self, *args, **kwargs)
+            self.query_cache.put(key, value)
+        return value
+    return wrapper
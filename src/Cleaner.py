@@ -1,14 +1,85 @@
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import numpy as np
+import openpyxl
 import pandas as pd
+from .Data import Data
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    # the columnar output is optional, the csv files are always written
+    pa = None
 
 # TODO: create unit test for class cleaner
 
 class Cleaner:
     __output_folder = ".\\Data\\Clean\\"
+    TEXT_COLUMNS = ['country_of_origin_abbr', 'country_of_origin_name', 'country_of_asylum_abbr', 'country_of_asylum_name', 'region_of_asylum', 'category']
+    DEFAULT_CHUNK_SIZE = 50_000
+    # partition of the asylum rows without year in the incremental output
+    MISSING_YEAR_PARTITION = 'missing'
+    # text pandas.read_excel reads as missing, the streamed rows are read the same way
+    EXCEL_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL',
+                       'NaN', 'None', 'n/a', 'nan', 'null']
+
+    def __init__(self, output_folder: str = None):
+        """
+            Args:
+                output_folder (str): folder of the clean data, ending with a separator, by default .\\Data\\Clean\\
+        """
+        if output_folder is not None:
+            self.__output_folder = output_folder
 
     @staticmethod
     def __Asylum_data_cleaner(data_path: str) -> pd.DataFrame:
         asylum_raw = pd.read_excel(data_path, sheet_name="DATA")
+        return Cleaner.Clean_asylum_chunk(asylum_raw)
+
+    @staticmethod
+    def Read_asylum_chunks(data_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+            Reads the raw asylum data chunk_size rows at a time, from the DATA sheet of the workbook in read-only mode or from a csv export of it
+
+            Args:
+                data_path (str): path of the .xlsx workbook or of the .csv export
+                chunk_size (int): rows per chunk
+
+            Returns:
+                generator of pandas.DataFrame with the raw columns
+        """
+        if data_path.lower().endswith('.csv'):
+            yield from pd.read_csv(data_path, chunksize=chunk_size)
+            return
+
+        workbook = openpyxl.load_workbook(data_path, read_only=True, data_only=True)
+        try:
+            rows = workbook["DATA"].iter_rows(values_only=True)
+            columns = next(rows)
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                chunk = pd.DataFrame(chunk, columns=columns)
+                yield chunk.mask(chunk.isin(Cleaner.EXCEL_NA_VALUES))
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def Clean_asylum_chunk(asylum_raw: pd.DataFrame) -> pd.DataFrame:
+        """
+            Cleans raw asylum rows, the whole sheet or one chunk of it
+
+            Args:
+                asylum_raw (pandas.DataFrame): rows of the DATA sheet
 
+            Returns:
+                pandas.DataFrame with the clean asylum data columns
+        """
         # Drop columns not in use
         asylum_dropped_rows = asylum_raw.drop(columns=['origin', 'asylum'])
 
@@ -34,8 +105,7 @@ class Cleaner:
         }
         asylum_clean = asylum_name_changed.rename(columns=new_column_names)
 
-        rows_to_delete = asylum_clean[asylum_clean['country_of_origin_abbr'].isin(['TIB'])].index
-        asylum_clean = asylum_clean.drop(rows_to_delete)
+        asylum_clean = asylum_clean[~asylum_clean['country_of_origin_abbr'].isin(['TIB'])]
         # Delete 'Not classified' is empty
         # fix West Bank and Gaza problem
 
@@ -55,11 +125,374 @@ class Cleaner:
         return data_nn
     
     @staticmethod
-    def Output_asylum_seekers_clean_data(self, source_path: str) -> None:
-        clean_data_asylum = self.__Asylum_data_cleaner(source_path)
-        clean_data_asylum.to_csv(f"{self.__output_folder}Asylum_data.csv", index=False)
+    def Asylum_schema():
+        """
+            Column types of the clean asylum data in the columnar output
+        """
+        return pa.schema([(column, pa.string()) for column in Cleaner.TEXT_COLUMNS] + [('year', pa.int64()), ('count', pa.int64())])
+
+    @staticmethod
+    def View_schema(view: pd.DataFrame):
+        """
+            Column types of an aggregate view in the columnar output, the ones of its columns in the asylum data, None without pyarrow
+        """
+        return pa.schema([field for field in Cleaner.Asylum_schema() if field.name in view.columns]) if pa is not None else None
 
     @staticmethod
+    def Population_schema(data: pd.DataFrame):
+        """
+            Column types of the clean population data in the columnar output, one float column per year
+        """
+        return pa.schema([('Country Name', pa.string()), ('Country Code', pa.string())] + [(year, pa.float64()) for year in data.columns[2:]])
+
+    @staticmethod
+    def Output_table(data: pd.DataFrame, file_path: str, schema=None) -> None:
+        """
+            Writes the data to a csv file and, when pyarrow is installed, to an uncompressed feather file next to it so it can be memory mapped
+
+            Args:
+                data (pandas.DataFrame): data to write
+                file_path (str): path without extension
+                schema (pyarrow.Schema): explicit column types of the feather file
+        """
+        data.to_csv(f"{file_path}.csv", index=False)
+        if pa is not None:
+            table = pa.Table.from_pandas(data, schema=schema, preserve_index=False)
+            feather.write_feather(table, f"{file_path}.feather", compression='uncompressed')
+
+    @staticmethod
+    def Output_table_chunks(chunks, file_path: str, schema=None) -> None:
+        """
+            Writes the data chunk by chunk, appending to the csv file and to the feather file, so only one chunk is in memory
+
+            Args:
+                chunks (iterable): pandas.DataFrame chunks with the same columns
+                file_path (str): path without extension
+                schema (pyarrow.Schema): explicit column types of the feather file, needed so every chunk has the same types
+        """
+        writer = None
+        try:
+            for index, chunk in enumerate(chunks):
+                chunk.to_csv(f"{file_path}.csv", index=False, mode='w' if index == 0 else 'a', header=index == 0)
+                if pa is not None:
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    if writer is None:
+                        # feather files are arrow ipc files, written batch by batch
+                        writer = pa.ipc.new_file(f"{file_path}.feather", table.schema)
+                    writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def Output_aggregate_views(self, clean_data_asylum: pd.DataFrame) -> None:
+        """
+            Writes every one of the Data.AGGREGATE_VIEWS of the clean asylum data to the Views folder, Data getters read them instead of grouping the full table
+
+            Args:
+                clean_data_asylum (pandas.DataFrame): clean asylum data
+        """
+        self.Output_views({name: Data.Build_aggregate_view(clean_data_asylum, name) for name in Data.AGGREGATE_VIEWS})
+
+    def Output_views(self, views: dict) -> None:
+        """
+            Writes the aggregate views of the Asylum_data already written, with the token of its files so Data knows they match it
+        """
+        os.makedirs(f"{self.__output_folder}Views", exist_ok=True)
+        for name, view in views.items():
+            self.Output_table(view, f"{self.__output_folder}Views\\{name}", self.View_schema(view))
+        self.Write_views_manifest()
+
+    def Write_views_manifest(self) -> None:
+        path = f"{self.__output_folder}Views_manifest.json"
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump({'asylum_data': Data.Views_token(self.__output_folder)}, file, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def Output_asylum_seekers_clean_data(self, source_path: str, chunk_size: int = None) -> None:
+        """
+            Cleans the raw asylum data and writes it with its aggregate views
+
+            Args:
+                source_path (str): path of the UNHCR workbook, or of a csv export of its DATA sheet when streaming
+                chunk_size (int): streams the data chunk_size rows at a time with bounded memory, None reads the whole sheet at once
+        """
+        schema = self.Asylum_schema() if pa is not None else None
+        # the year partitions of the last incremental run do not match the new data anymore
+        if os.path.exists(f"{self.__output_folder}Asylum_data_manifest.json"):
+            os.remove(f"{self.__output_folder}Asylum_data_manifest.json")
+        if chunk_size is None:
+            clean_data_asylum = self.__Asylum_data_cleaner(source_path)
+            self.Output_table(clean_data_asylum, f"{self.__output_folder}Asylum_data", schema)
+            self.Output_aggregate_views(clean_data_asylum)
+            return
+
+        # the views are sums, the partial views of the chunks are summed again when they hold as many rows as the last sum,
+        # so memory is bounded by the groups of each view and not by the rows of the data
+        partial_views = {name: [] for name in Data.AGGREGATE_VIEWS}
+        summed_rows = {name: 0 for name in Data.AGGREGATE_VIEWS}
+
+        def clean_chunks():
+            for asylum_raw in self.Read_asylum_chunks(source_path, chunk_size):
+                chunk = self.Clean_asylum_chunk(asylum_raw)
+                for name, partials in partial_views.items():
+                    partials.append(Data.Build_aggregate_view(chunk, name))
+                    if sum(len(partial) for partial in partials) > 2 * max(summed_rows[name], chunk_size):
+                        partial_views[name] = [Data.Build_aggregate_view(pd.concat(partials), name)]
+                        summed_rows[name] = len(partial_views[name][0])
+                yield chunk
+
+        self.Output_table_chunks(clean_chunks(), f"{self.__output_folder}Asylum_data", schema)
+        self.Output_views({name: Data.Build_aggregate_view(pd.concat(partials), name) for name, partials in partial_views.items()})
+
     def Output_population_clean_data(self, source_path: str) -> None:
         clean_data_population = self.__Clean_Population_Data(source_path)
-        clean_data_population.to_csv(f"{self.__output_folder}Population_data.csv", index=False)
\ No newline at end of file
+        self.Output_table(clean_data_population, f"{self.__output_folder}Population_data", self.Population_schema(clean_data_population) if pa is not None else None)
+
+    @staticmethod
+    def File_hash(file_path: str) -> str:
+        """
+            sha256 of the content of a file, read in blocks
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def Table_hash(data: pd.DataFrame) -> str:
+        """
+            sha256 of the values of a DataFrame, rows in the same order give the same hash
+        """
+        return hashlib.sha256(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()).hexdigest()
+
+    def Read_manifest(self, dataset: str) -> dict:
+        """
+            Reads the manifest of the last run of a dataset, one file per dataset so the datasets can be cleaned at the same time
+
+            Args:
+                dataset (str): 'Asylum_data' or 'Population_data'
+
+            Returns:
+                dict with the hash of the raw 'source' and of every year partition in 'partitions', empty when there was no run
+        """
+        try:
+            with open(f"{self.__output_folder}{dataset}_manifest.json", encoding='utf-8') as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {}
+        manifest.setdefault('source', None)
+        manifest.setdefault('partitions', {})
+        return manifest
+
+    def Write_manifest(self, dataset: str, manifest: dict) -> None:
+        path = f"{self.__output_folder}{dataset}_manifest.json"
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def Partition_path(self, table: str, year) -> str:
+        """
+            Path without extension of the year partition of the asylum data or of one of its aggregate views
+        """
+        return f"{self.__output_folder}Partitions\\{table}\\year={year}"
+
+    @staticmethod
+    def Partition_keys(years: pd.Series) -> pd.Series:
+        """
+            Names of the year partitions of the rows, the rows without year go to the MISSING_YEAR_PARTITION
+        """
+        return years.astype('Int64').astype(str).where(years.notna(), Cleaner.MISSING_YEAR_PARTITION)
+
+    def Updated_views(self, partition_keys: list, rebuilt_keys: set) -> dict:
+        """
+            Computes the aggregate views of the partitions, reusing the views written by the last run for the years that did not change.
+            Views grouped by year keep the rows of the unchanged years and get the rows of the rebuilt ones from their partial views,
+            the other views are summed again from the partial views of every year, which have one row per group and year.
+
+            Args:
+                partition_keys (list): partitions of the data, see Partition_keys
+                rebuilt_keys (set): partitions rewritten or removed by this run
+
+            Returns:
+                dict view name -> pandas.DataFrame
+        """
+        unchanged_keys = set(partition_keys) - rebuilt_keys
+        views = {}
+        for name, columns in Data.AGGREGATE_VIEWS.items():
+            view_path = f"{self.__output_folder}Views\\{name}"
+            if 'year' in columns and unchanged_keys and (os.path.exists(f"{view_path}.feather") or os.path.exists(f"{view_path}.csv")):
+                previous_view = Data.Read_clean_table(view_path)
+                parts = [previous_view[self.Partition_keys(previous_view['year']).isin(unchanged_keys)]]
+                parts += [Data.Read_clean_table(self.Partition_path(name, key)) for key in partition_keys if key in rebuilt_keys]
+            else:
+                parts = [Data.Read_clean_table(self.Partition_path(name, key)) for key in partition_keys]
+            views[name] = Data.Build_aggregate_view(pd.concat(parts, ignore_index=True), name)
+        return views
+
+    def Source_order_chunks(self, runs: list, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+            Reads the rows of the year partitions back in the order of the source
+
+            Args:
+                runs (list): [partition key, rows] of every run of consecutive source rows in the same partition
+                chunk_size (int): rows of the chunks yielded, at least
+
+            Returns:
+                generator of pandas.DataFrame
+        """
+        partitions = {}
+        read_rows = {}
+        for first_run, last_run in Cleaner.__Run_groups([rows for key, rows in runs], chunk_size):
+            chunk_runs = runs[first_run:last_run]
+            # one slice per partition, in the order the partitions first appear in the chunk
+            codes, keys = pd.factorize(pd.Series([key for key, rows in chunk_runs]), sort=False)
+            lengths = np.array([rows for key, rows in chunk_runs], dtype=np.int64)
+            slices = []
+            for code, key in enumerate(keys):
+                if key not in partitions:
+                    partitions[key] = Data.Read_clean_table(self.Partition_path('Asylum_data', key))
+                    read_rows[key] = 0
+                rows = int(lengths[codes == code].sum())
+                slices.append(partitions[key].iloc[read_rows[key]:read_rows[key] + rows])
+                read_rows[key] += rows
+                if read_rows[key] == len(partitions[key]):
+                    del partitions[key]
+            chunk = pd.concat(slices, ignore_index=True)
+
+            # where every run starts in the concatenated slices and in the chunk
+            order = np.argsort(codes, kind='stable')
+            slice_starts = np.empty_like(lengths)
+            slice_starts[order] = np.cumsum(lengths[order]) - lengths[order]
+            chunk_starts = np.cumsum(lengths) - lengths
+            positions = np.arange(lengths.sum()) + np.repeat(slice_starts - chunk_starts, lengths)
+            yield chunk.take(positions).reset_index(drop=True)
+
+    @staticmethod
+    def __Run_groups(lengths: list, chunk_size: int) -> list:
+        """
+            Splits the runs in groups of consecutive runs with at least chunk_size rows, the last one can have less
+
+            Returns:
+                list of tuples (first run, run after the last)
+        """
+        groups = []
+        first_run = 0
+        rows = 0
+        for run, length in enumerate(lengths):
+            rows += length
+            if rows >= chunk_size:
+                groups.append((first_run, run + 1))
+                first_run, rows = run + 1, 0
+        if first_run < len(lengths):
+            groups.append((first_run, len(lengths)))
+        return groups
+
+    def Update_asylum_seekers_clean_data(self, source_path: str, chunk_size: int = None) -> list:
+        """
+            Updates the clean asylum data written by a previous run, rebuilding only what changed.
+            When the hash of the source is the one in the manifest nothing is read. Otherwise the source is cleaned and split by year,
+            only the years whose rows changed get their partition and the partial aggregate views of the partition rewritten.
+            Asylum_data is then written again from the partitions, in the order of the source rows, and the views only recompute the changed years.
+            The rows without year are kept in their own partition, like the full clean keeps them.
+
+            Args:
+                source_path (str): path of the UNHCR workbook, or of a csv export of its DATA sheet when streaming
+                chunk_size (int): streams the source chunk_size rows at a time, None reads the whole sheet at once
+
+            Returns:
+                list with the years rebuilt or removed, None first when the rows without year changed
+        """
+        manifest = self.Read_manifest('Asylum_data')
+        source_hash = self.File_hash(source_path)
+        if manifest['source'] == source_hash and os.path.exists(f"{self.__output_folder}Asylum_data.csv"):
+            return []
+
+        if chunk_size is None:
+            clean_chunks = [self.__Asylum_data_cleaner(source_path)]
+        else:
+            clean_chunks = (self.Clean_asylum_chunk(asylum_raw) for asylum_raw in self.Read_asylum_chunks(source_path, chunk_size))
+
+        # the views of the last run are only reused when they were built from the Asylum_data still there
+        views_match = Data.Views_match(self.__output_folder)
+        tables = ['Asylum_data'] + list(Data.AGGREGATE_VIEWS)
+        for table in tables:
+            os.makedirs(f"{self.__output_folder}Partitions\\{table}", exist_ok=True)
+
+        changed_keys = []
+        partitions = {}
+        # partition and number of rows of every run of consecutive source rows in the same partition, to write Asylum_data in the source order
+        runs = []
+        with tempfile.TemporaryDirectory() as staging_folder:
+            # the rows of a year can be in any chunk, they are staged in a file per year and chunk
+            staged_chunks = {}
+            for index, chunk in enumerate(clean_chunks):
+                keys = self.Partition_keys(chunk['year']).to_numpy()
+                run_starts = np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1]) if len(keys) else []
+                for run_start, run_stop in zip(run_starts, list(run_starts[1:]) + [len(keys)]):
+                    if runs and runs[-1][0] == keys[run_start]:
+                        runs[-1][1] += int(run_stop - run_start)
+                    else:
+                        runs.append([keys[run_start], int(run_stop - run_start)])
+                for key, rows in chunk.groupby(keys, sort=False):
+                    if key != self.MISSING_YEAR_PARTITION:
+                        # the same year has the same types whether or not its chunk has rows without year
+                        rows = rows.astype({'year': 'int64'})
+                    staging_path = os.path.join(staging_folder, f"{key}_{index}.pkl")
+                    rows.to_pickle(staging_path)
+                    staged_chunks.setdefault(key, []).append(staging_path)
+
+            for key, staging_paths in staged_chunks.items():
+                rows = pd.concat([pd.read_pickle(staging_path) for staging_path in staging_paths], ignore_index=True)
+                partitions[key] = self.Table_hash(rows)
+                if manifest['partitions'].get(key) == partitions[key]:
+                    continue
+                changed_keys.append(key)
+                self.Output_table(rows, self.Partition_path('Asylum_data', key), self.Asylum_schema() if pa is not None else None)
+                for name in Data.AGGREGATE_VIEWS:
+                    view = Data.Build_aggregate_view(rows, name)
+                    self.Output_table(view, self.Partition_path(name, key), self.View_schema(view))
+
+        removed_keys = [key for key in manifest['partitions'] if key not in partitions]
+        for key in removed_keys:
+            for table in tables:
+                for extension in ['csv', 'feather']:
+                    if os.path.exists(f"{self.Partition_path(table, key)}.{extension}"):
+                        os.remove(f"{self.Partition_path(table, key)}.{extension}")
+
+        # Data reads a single Asylum_data file, so it is written again whenever the rows or their order changed
+        order_hash = hashlib.sha256(json.dumps(runs).encode('utf-8')).hexdigest()
+        asylum_data_written = changed_keys or removed_keys or manifest.get('order') != order_hash or not os.path.exists(f"{self.__output_folder}Asylum_data.csv")
+        if asylum_data_written:
+            self.Output_table_chunks(self.Source_order_chunks(runs, chunk_size or self.DEFAULT_CHUNK_SIZE),
+                                     f"{self.__output_folder}Asylum_data", self.Asylum_schema() if pa is not None else None)
+        if changed_keys or removed_keys or not views_match:
+            partition_keys = sorted(partitions, key=lambda key: (key == self.MISSING_YEAR_PARTITION, int(key) if key.isdigit() else 0))
+            rebuilt_keys = set(changed_keys + removed_keys) if views_match else set(partition_keys)
+            self.Output_views(self.Updated_views(partition_keys, rebuilt_keys))
+        elif asylum_data_written:
+            # same rows in another order, the views still match the new files
+            self.Write_views_manifest()
+
+        manifest['source'] = source_hash
+        manifest['partitions'] = partitions
+        manifest['order'] = order_hash
+        self.Write_manifest('Asylum_data', manifest)
+        rebuilt = changed_keys + removed_keys
+        return ([None] if self.MISSING_YEAR_PARTITION in rebuilt else []) + sorted(int(key) for key in rebuilt if key != self.MISSING_YEAR_PARTITION)
+
+    def Update_population_clean_data(self, source_path: str) -> bool:
+        """
+            Rewrites the clean population data only when the hash of the source is not the one in the manifest
+
+            Returns:
+                bool, True when the data was rewritten
+        """
+        manifest = self.Read_manifest('Population_data')
+        source_hash = self.File_hash(source_path)
+        if manifest['source'] == source_hash and os.path.exists(f"{self.__output_folder}Population_data.csv"):
+            return False
+        self.Output_population_clean_data(source_path)
+        manifest['source'] = source_hash
+        self.Write_manifest('Population_data', manifest)
+        return True
\ No newline at end of file
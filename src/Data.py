@@ -1,13 +1,87 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
-import timeit
-from timing.CaptureReturnValue import CaptureReturnValue as capture
+from .Cache import LRUCache, cached_query
+from .Instrumentation import instrumented
 
 class Data:
-    time_df = {'df_and_text' : [], 'inverse_df': [], 'text': []}
+    __data_folder = ".\\Data\\Clean\\"
+    __shared = None
+    __shared_lock = threading.Lock()
+    MAX_DISPLAY_COUNTRIES = 5
+    # low cardinality text as categories, years and counts in the smallest integers that hold them, nullable when some are missing
+    COMPACT_SCHEMA = {
+        'country_of_origin_abbr': 'category',
+        'country_of_origin_name': 'category',
+        'country_of_asylum_abbr': 'category',
+        'country_of_asylum_name': 'category',
+        'region_of_asylum': 'category',
+        'category': 'category',
+        'year': 'int16',
+        'count': 'int32'
+    }
+    # pre-aggregated views of asylum_data written by Cleaner, name: group columns
+    AGGREGATE_VIEWS = {
+        'by_year': ['year'],
+        'by_origin': ['country_of_origin_abbr', 'country_of_origin_name'],
+        'by_asylum': ['country_of_asylum_abbr', 'country_of_asylum_name'],
+        'by_origin_year': ['country_of_origin_abbr', 'country_of_origin_name', 'year'],
+        'by_asylum_year': ['country_of_asylum_abbr', 'country_of_asylum_name', 'year'],
+        'by_origin_asylum_year': ['country_of_origin_abbr', 'country_of_origin_name', 'country_of_asylum_abbr', 'country_of_asylum_name',
+                                  'region_of_asylum', 'category', 'year']
+    }
+    # sorted copies for Get_rows_of written by Export_memmap, (source, column)
+    MEMMAP_OFFSETS = [
+        ('asylum_data', 'country_of_origin_abbr'),
+        ('asylum_data', 'country_of_asylum_abbr'),
+        ('by_origin_year', 'country_of_origin_abbr'),
+    ]
+    # analisis type: total description and partner countries of the hover texts
+    HOVER_TITLES = {
+        'origin': ('Displaced population:', 'destination'),
+        'asylum': ('Asylum seekers received:', 'origin')
+    }
+    MINIMUN_CONSIDERATION_VALUE = 1_000
+    CRISIS_INCREMENT_ALERT = 0.5 # Increments higher than this % are consider crisis
 
-    def __init__(self):
-        self.asylum_data = pd.read_csv('.\\Data\\Clean\\Asylum_data.csv')
-        self.population_data = pd.read_csv(".\\Data\\Clean\\Population_data.csv")
+    def __init__(self, compact_schema: bool = False, cache_size: int = 128, cache_memory: int = None, data_folder: str = None, years=None,
+                 memmap_folder: str = None):
+        """
+            Loads the clean asylum and population data
+
+            Args:
+                compact_schema (bool): stores asylum_data with COMPACT_SCHEMA, see Compact_asylum_data
+                cache_size (int): number of per-country query results kept in query_cache
+                cache_memory (int): bytes of query results kept in query_cache, None for no memory limit
+                data_folder (str): folder with the clean data written by Cleaner, ending with a separator, by default .\\Data\\Clean\\
+                years (iterable): loads only the asylum data of these years, like range(2010, 2025), None loads every year
+                memmap_folder (str): folder written by Export_memmap, ending with a separator, the data is memory mapped from it instead of read,
+                                     with COMPACT_SCHEMA and the years of the export. Every process attaching to the same folder shares its memory.
+        """
+        if data_folder is not None:
+            self.__data_folder = data_folder
+        self.years = None if years is None else sorted({int(year) for year in years})
+        self.__derived = {}
+        self.__derived_locks = {}
+        self.__derived_lock = threading.Lock()
+        self.data_version = 0
+        self.query_cache = LRUCache(cache_size, cache_memory)
+        self.__compact_schema = compact_schema
+        if memmap_folder is not None:
+            self.__Attach_memmap(memmap_folder)
+        else:
+            self.asylum_data = self.__Read_asylum_data()
+            if compact_schema:
+                self.asylum_data = self.Compact_asylum_data(self.asylum_data)
+            # the views written by Cleaner match the data until asylum_data is replaced, they have every year
+            self.__views_folder = f"{self.__data_folder}Views\\" if self.years is None and self.Views_match(self.__data_folder) else None
+            self.population_data = self.Read_clean_table(f"{self.__data_folder}Population_data")
+            self.__data_token = self.__Files_token([f"{self.__data_folder}{name}.{extension}" for name in ['Asylum_data', 'Population_data'] for extension in ['feather', 'csv']], self.years)
 
         self.abbr_dict = {
                             row["country_of_origin_abbr"]: row["country_of_origin_name"]
@@ -25,6 +99,505 @@ class Data:
         self.abbr_dict['NLD'] = 'Netherlands'
         self.abbr_dict['FSM'] = 'Micronesia'
 
+    @classmethod
+    def Get_shared(cls) -> 'Data':
+        """
+            Gets the Data instance shared by the whole process, the data is loaded the first time it is requested.
+            When the ASYLUM_MEMMAP_FOLDER environment variable is set the data is memory mapped from that folder, see Export_memmap.
+
+            Returns:
+                Data instance
+        """
+        if Data.__shared is None:
+            with Data.__shared_lock:
+                if Data.__shared is None:
+                    # the workers of a server attach to the data exported once with Export_memmap
+                    memmap_folder = os.environ.get('ASYLUM_MEMMAP_FOLDER')
+                    Data.__shared = cls(memmap_folder=memmap_folder) if memmap_folder else cls()
+        return Data.__shared
+
+    @staticmethod
+    def Set_shared(data: 'Data') -> None:
+        """
+            Replaces the Data instance shared by the whole process, for example with a preloaded or custom one
+
+            Args:
+                data (Data): instance to share, None loads the default data again on next use
+        """
+        with Data.__shared_lock:
+            Data.__shared = data
+
+    @staticmethod
+    @instrumented
+    def Read_clean_table(file_path: str, years: list = None) -> pd.DataFrame:
+        """
+            Reads a clean table, preferring the feather file written by Cleaner, memory mapped, and falling back to the csv file
+
+            Args:
+                file_path (str): path without extension
+                years (list): keeps only the rows of these years, filtered before the rows are converted to pandas, None keeps every row
+
+            Returns:
+                pandas.DataFrame with the clean data
+        """
+        if os.path.exists(f"{file_path}.feather"):
+            try:
+                # imported on the first read, so importing Data and Visualization stays cheap
+                import pyarrow as pa
+                import pyarrow.compute as pc
+                import pyarrow.feather as feather
+            except ImportError:
+                # without pyarrow the clean data is read from the csv files
+                pa = None
+            if pa is not None:
+                table = feather.read_table(f"{file_path}.feather", memory_map=True)
+                if years is not None:
+                    # only the year column is scanned, only the selected rows are copied out of the mapped file
+                    table = table.filter(pc.is_in(table['year'], value_set=pa.array(years, type=table.schema.field('year').type)))
+                # numeric columns without nulls stay backed by the mapped file
+                return table.to_pandas(split_blocks=True)
+        if years is None:
+            return pd.read_csv(f"{file_path}.csv")
+        chunks = [chunk[chunk['year'].isin(years)] for chunk in pd.read_csv(f"{file_path}.csv", chunksize=100_000)]
+        return pd.concat(chunks, ignore_index=True)
+
+    def __Read_asylum_data(self) -> pd.DataFrame:
+        """
+            Reads the asylum data of self.years, from the year partitions written by Cleaner.Update_asylum_seekers_clean_data when they are there
+        """
+        file_path = f"{self.__data_folder}Asylum_data"
+        if self.years is None:
+            return self.Read_clean_table(file_path)
+
+        # the partitions in the manifest are the ones that match Asylum_data
+        try:
+            with open(f"{file_path}_manifest.json", encoding='utf-8') as file:
+                # the rows without year have their own partition, they are never in a range of years
+                partitioned_years = {int(year) for year in json.load(file)['partitions'] if year.isdigit()}
+        except (FileNotFoundError, KeyError, ValueError):
+            partitioned_years = set()
+        years = [year for year in self.years if year in partitioned_years]
+        if not years:
+            return self.Read_clean_table(file_path, self.years)
+        partitions = [self.Read_clean_table(f"{self.__data_folder}Partitions\\Asylum_data\\year={year}") for year in years]
+        return pd.concat(partitions, ignore_index=True)
+
+    @staticmethod
+    def Write_memmap_table(data: pd.DataFrame, folder: str, table: str) -> dict:
+        """
+            Writes a table as .npy files that can be memory mapped, each run of consecutive numeric columns of the same type
+            in one file, every nullable numeric column as its values and a null mask, and every categorical or text column as its category codes
+
+            Args:
+                data (pandas.DataFrame): table, an index that is not the default one is written too
+                folder (str): folder of the files, ending with a separator
+                table (str): name of the table, prefix of its files
+
+            Returns:
+                dict with rows, the runs of columns and the index file, to attach the table with Attach_memmap_table
+        """
+        runs = []
+        for column in data.columns:
+            dtype = data[column].dtype
+            if isinstance(data[column].array, pd.api.extensions.ExtensionArray) and hasattr(dtype, 'numpy_dtype') and dtype.kind in 'biuf':
+                runs.append({'kind': 'nullable', 'dtype': dtype.name, 'columns': [column]})
+            elif not isinstance(dtype, np.dtype) or dtype.kind not in 'biuf':
+                runs.append({'kind': 'category' if isinstance(dtype, pd.CategoricalDtype) else 'text', 'columns': [column]})
+            elif runs and runs[-1]['kind'] == 'numeric' and runs[-1]['dtype'] == dtype.str:
+                runs[-1]['columns'].append(column)
+            else:
+                runs.append({'kind': 'numeric', 'dtype': dtype.str, 'columns': [column]})
+
+        for index, run in enumerate(runs):
+            run['file'] = f"{table}.{index}.npy"
+            if run['kind'] == 'numeric':
+                array = data[run['columns']].to_numpy()
+            elif run['kind'] == 'nullable':
+                column = data[run['columns'][0]]
+                run['mask'] = f"{table}.{index}.mask.npy"
+                Data.__Save_array(f"{folder}{run['mask']}", column.isna().to_numpy())
+                array = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+            else:
+                categorical = pd.Categorical(data[run['columns'][0]])
+                run['categories'] = categorical.categories.tolist()
+                run['ordered'] = bool(categorical.ordered)
+                array = categorical.codes
+            Data.__Save_array(f"{folder}{run['file']}", array)
+        description = {'rows': len(data), 'runs': runs}
+        if not data.index.equals(pd.RangeIndex(len(data))):
+            description['index'] = f"{table}.index.npy"
+            Data.__Save_array(f"{folder}{description['index']}", data.index.to_numpy())
+        return description
+
+    @staticmethod
+    def __Save_array(file_path: str, array: np.ndarray) -> None:
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.save(file, np.ascontiguousarray(array))
+        os.replace(temporary_path, file_path)
+
+    @staticmethod
+    def Attach_memmap_table(folder: str, description: dict) -> pd.DataFrame:
+        """
+            Builds a table over the memory mapped files written by Write_memmap_table without copying them.
+            The numeric and categorical columns are read only and shared with every process attached to the same files,
+            text columns are copied into the process.
+
+            Args:
+                folder (str): folder of the files, ending with a separator
+                description (dict): returned by Write_memmap_table
+
+            Returns:
+                pandas.DataFrame
+        """
+        # an empty file can not be mapped
+        mmap_mode = 'r' if description['rows'] else None
+        index = pd.RangeIndex(description['rows'])
+        if 'index' in description:
+            index = pd.Index(np.asarray(np.load(f"{folder}{description['index']}", mmap_mode=mmap_mode)), copy=False)
+        columns = []
+        for run in description['runs']:
+            # a plain array over the mapping, memmap subclasses leak into the results
+            array = np.asarray(np.load(f"{folder}{run['file']}", mmap_mode=mmap_mode))
+            if run['kind'] == 'numeric':
+                columns.append(pd.DataFrame(array, columns=run['columns'], copy=False))
+                continue
+            if run['kind'] == 'nullable':
+                mask = np.asarray(np.load(f"{folder}{run['mask']}", mmap_mode=mmap_mode))
+                values = pd.api.types.pandas_dtype(run['dtype']).construct_array_type()(array, mask, copy=False)
+                columns.append(pd.DataFrame({run['columns'][0]: values}, copy=False))
+                continue
+            values = pd.Categorical.from_codes(array, categories=pd.Index(run['categories']), ordered=run['ordered'], validate=False)
+            if run['kind'] == 'text':
+                values = np.asarray(values, dtype=object)
+            columns.append(pd.DataFrame({run['columns'][0]: values}, copy=False))
+        if not columns:
+            return pd.DataFrame(index=index)
+        table = pd.concat(columns, axis=1, copy=False)
+        table.index = index
+        return table
+
+    def Export_memmap(self, folder: str) -> None:
+        """
+            Writes asylum_data with COMPACT_SCHEMA, population_data, the AGGREGATE_VIEWS and the sorted copies of MEMMAP_OFFSETS
+            as memory mappable files, so the workers of a server can attach to one copy with Data(memmap_folder=folder) instead of loading their own.
+            Every export writes files with new names and replaces Memmap.json last, the workers always attach to the files of one export.
+            The files of the exports before the previous one are removed.
+
+            Args:
+                folder (str): folder of the files, ending with a separator
+        """
+        os.makedirs(folder, exist_ok=True)
+        try:
+            with open(f"{folder}Memmap.json", encoding='utf-8') as file:
+                previous_generation = json.load(file).get('generation')
+        except (FileNotFoundError, ValueError):
+            previous_generation = None
+        generation = hashlib.sha1(f"{self.Get_data_token()}|{time.time_ns()}|{os.getpid()}".encode('utf-8')).hexdigest()[:16]
+
+        asylum_data = self.Compact_asylum_data(self.asylum_data)
+        views = {name: self.Compact_asylum_data(self.Get_aggregate_view(name)) for name in self.AGGREGATE_VIEWS}
+        offsets = {}
+        for source, column in self.MEMMAP_OFFSETS:
+            sorted_data, value_offsets = self.Build_offset_index(asylum_data if source == 'asylum_data' else views[source], column)
+            offsets[f"{source}:{column}"] = {
+                'source': source, 'column': column, 'offsets': {str(value): offset for value, offset in value_offsets.items()},
+                'table': self.Write_memmap_table(sorted_data, folder, f"{generation}.Sorted_{source}_{column}"),
+            }
+        manifest = {
+            'generation': generation,
+            'token': self.Get_data_token(),
+            'years': self.years,
+            'tables': {table: self.Write_memmap_table(data, folder, f"{generation}.{table}")
+                       for table, data in {'Asylum_data': asylum_data, 'Population_data': self.population_data}.items()},
+            'views': {name: self.Write_memmap_table(view, folder, f"{generation}.View_{name}") for name, view in views.items()},
+            'offsets': offsets,
+        }
+        temporary_path = f"{folder}Memmap.json.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(temporary_path, f"{folder}Memmap.json")
+
+        # a worker may still be attaching to the previous export, older ones are not used anymore
+        for file_path in glob.glob(f"{glob.escape(folder)}*.npy"):
+            if os.path.basename(file_path).split('.')[0] not in (generation, previous_generation):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    # still mapped by a worker on Windows, removed by a later export
+                    pass
+
+    def __Attach_memmap(self, folder: str) -> None:
+        with open(f"{folder}Memmap.json", encoding='utf-8') as file:
+            manifest = json.load(file)
+        self.years = manifest['years']
+        self.__compact_schema = True
+        self.asylum_data = self.Attach_memmap_table(folder, manifest['tables']['Asylum_data'])
+        self.population_data = self.Attach_memmap_table(folder, manifest['tables']['Population_data'])
+        self.__views_folder = None
+        self.__data_token = manifest['token']
+        # the views and the sorted copies of Get_rows_of are mapped too, they are precomputed until the data is replaced
+        for name, description in manifest['views'].items():
+            self.__derived[('view', name)] = self.Attach_memmap_table(folder, description)
+        for offsets in manifest['offsets'].values():
+            sorted_data = self.Attach_memmap_table(folder, offsets['table'])
+            self.__derived[('offsets', offsets['source'], offsets['column'])] = (sorted_data, {value: tuple(offset) for value, offset in offsets['offsets'].items()})
+
+    @staticmethod
+    def Compact_asylum_data(data: pd.DataFrame) -> pd.DataFrame:
+        """
+            Converts asylum data to COMPACT_SCHEMA, using less memory and comparing codes instead of strings when filtering.
+            Every method gives the same values with the compact data, key columns of the results can come back as categories.
+            Counts too big for int32 are kept as int64, years or counts with missing values, like the rows without year kept by Cleaner, use the nullable Int16 and Int32.
+
+            Args:
+                data (pandas.DataFrame): asylum data
+
+            Returns:
+                pandas.DataFrame with the compact column types
+        """
+        schema = {column: dtype for column, dtype in Data.COMPACT_SCHEMA.items() if column in data.columns}
+        if 'count' in schema and len(data) and data['count'].abs().max() > np.iinfo(np.int32).max:
+            del schema['count']
+        for column in ['year', 'count']:
+            if column in schema and data[column].isna().any():
+                schema[column] = schema[column].capitalize()
+        return data.astype(schema)
+
+    @property
+    def asylum_data(self) -> pd.DataFrame:
+        return self.__asylum_data
+
+    @asylum_data.setter
+    def asylum_data(self, data: pd.DataFrame) -> None:
+        self.__asylum_data = data
+        self.__views_folder = None
+        self.__Data_changed()
+
+    @property
+    def population_data(self) -> pd.DataFrame:
+        return self.__population_data
+
+    @population_data.setter
+    def population_data(self, data: pd.DataFrame) -> None:
+        self.__population_data = data
+        self.__Data_changed()
+
+    def __Data_changed(self) -> None:
+        # new version for the cached queries, everything precomputed is stale now
+        self.data_version += 1
+        self.__data_token = None
+        self.__derived.clear()
+
+    def Clear_caches(self) -> None:
+        """
+            Drops the cached query results and everything precomputed, unlike replacing the data the files it was read from are still used
+        """
+        self.query_cache.clear()
+        self.__derived.clear()
+
+    @staticmethod
+    def __Files_token(file_paths: list, years: list = None) -> str:
+        files = [f"{path}:{os.stat(path).st_size}:{os.stat(path).st_mtime_ns}" for path in file_paths if os.path.exists(path)]
+        return hashlib.sha1(f"{'|'.join(files)}|years={years}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def Views_token(data_folder: str) -> str:
+        """
+            Token of the Asylum_data files of a folder, Cleaner writes it in Views_manifest.json when it writes the views built from them
+
+            Args:
+                data_folder (str): folder with the clean data, ending with a separator
+
+            Returns:
+                str with the token, it changes when Asylum_data is written again
+        """
+        return Data.__Files_token([f"{data_folder}Asylum_data.{extension}" for extension in ['feather', 'csv']])
+
+    @staticmethod
+    def Views_match(data_folder: str) -> bool:
+        """
+            Checks that the views of a folder were built from its Asylum_data, views written by hand, before it was replaced
+            or by a run that stopped half way do not match and are computed from asylum_data instead
+
+            Args:
+                data_folder (str): folder with the clean data, ending with a separator
+
+            Returns:
+                bool, True when the token in Views_manifest.json is the one of the Asylum_data files
+        """
+        try:
+            with open(f"{data_folder}Views_manifest.json", encoding='utf-8') as file:
+                return json.load(file)['asylum_data'] == Data.Views_token(data_folder)
+        except (FileNotFoundError, KeyError, ValueError):
+            return False
+
+    def Get_data_token(self) -> str:
+        """
+            Gets a token that identifies the loaded data files across processes, it changes when the files are written again
+
+            Returns:
+                str with the token, None once the data was replaced in memory
+        """
+        return self.__data_token
+
+    def __Derived(self, key: tuple, builder):
+        """
+            Returns a value precomputed from asylum_data or population_data, building it on first use
+
+            Args:
+                key (tuple): name of the precomputed value
+                builder (callable): function without arguments that computes the value
+
+            Returns:
+                The value returned by builder, kept until asylum_data or population_data changes
+        """
+        if key not in self.__derived:
+            # one build per key when the callbacks and the pre-rendering threads ask at the same time
+            with self.__derived_lock:
+                key_lock = self.__derived_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                if key not in self.__derived:
+                    self.__derived[key] = builder()
+        return self.__derived[key]
+
+    @staticmethod
+    def Build_aggregate_view(data: pd.DataFrame, name: str) -> pd.DataFrame:
+        """
+            Sums the count of the asylum data by the group columns of one of the AGGREGATE_VIEWS, missing keys are kept as their own group
+
+            Args:
+                data (pandas.DataFrame): asylum data
+                name (str): name of the view
+
+            Returns:
+                pandas.DataFrame with the group columns and count
+        """
+        return data.groupby(Data.AGGREGATE_VIEWS[name], observed=True, dropna=False).agg({'count': 'sum'}).reset_index()
+
+    @instrumented
+    def Get_aggregate_view(self, name: str) -> pd.DataFrame:
+        """
+            Gets one of the AGGREGATE_VIEWS, read from the files written by Cleaner when they match asylum_data, otherwise computed from asylum_data.
+            The view is kept until asylum_data changes, it must not be modified.
+
+            Args:
+                name (str): name of the view
+
+            Returns:
+                pandas.DataFrame with the group columns and count
+        """
+        return self.__Derived(('view', name), lambda: self.__Load_aggregate_view(name))
+
+    def __Load_aggregate_view(self, name: str) -> pd.DataFrame:
+        if self.__views_folder is not None and (os.path.exists(f"{self.__views_folder}{name}.feather") or os.path.exists(f"{self.__views_folder}{name}.csv")):
+            view = self.Read_clean_table(f"{self.__views_folder}{name}")
+            return self.Compact_asylum_data(view) if self.__compact_schema else view
+        return self.Build_aggregate_view(self.asylum_data, name)
+
+    @staticmethod
+    def Build_offset_index(data: pd.DataFrame, column: str) -> tuple:
+        """
+            Sorts the data by a column keeping the order of the rows of each value, and finds where the rows of every value start and stop
+
+            Args:
+                data (pandas.DataFrame): data to index
+                column (str): column to sort by
+
+            Returns:
+                tuple (pandas.DataFrame sorted by column with the original index, dict value -> (start, stop) positions in the sorted data)
+        """
+        codes, values = pd.factorize(data[column])
+        order = np.argsort(codes, kind='stable')
+        # missing values have code -1 and are sorted first
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        stops = np.cumsum(counts) + np.count_nonzero(codes < 0)
+        starts = stops - counts
+        offsets = {value: (int(start), int(stop)) for value, start, stop in zip(values, starts, stops)}
+        return data.iloc[order], offsets
+
+    def Get_rows_of(self, value: str, column: str, source: str = 'asylum_data') -> pd.DataFrame:
+        """
+            Gets the rows where column is value as a contiguous slice of a copy of the data sorted by column, without scanning the whole table.
+            The sorted copy and its offsets are built on first use and kept until the data changes.
+            Gives the same rows, in the same order and with the same index, as data[data[column] == value].
+
+            Args:
+                value (str): value to look up, like a country code
+                column (str): column of the value, like 'country_of_origin_abbr'
+                source (str): 'asylum_data', 'population_long' or the name of one of the AGGREGATE_VIEWS
+
+            Returns:
+                pandas.DataFrame slice, it must not be modified
+        """
+        sorted_data, offsets = self.__Derived(('offsets', source, column), lambda: self.Build_offset_index(self.__Source(source), column))
+        start, stop = offsets.get(value, (0, 0))
+        return sorted_data.iloc[start:stop]
+
+    @staticmethod
+    def Top_k_positions(values: np.ndarray, k: int = None) -> np.ndarray:
+        """
+            Finds the positions of the k biggest values by partial selection, only the selected values are sorted
+
+            Args:
+                values (numpy.ndarray): numbers without missing values
+                k (int): number of positions, None ranks every value
+
+            Returns:
+                numpy.ndarray with the positions, biggest first and equal values in the order they have in values
+        """
+        k = len(values) if k is None else max(0, min(k, len(values)))
+        if k == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(values):
+            # the k-th biggest value, everything bigger is selected and the equal ones fill up to k by position
+            kth = np.partition(values, len(values) - k)[len(values) - k]
+            bigger = np.flatnonzero(values > kth)
+            candidates = np.concatenate([bigger, np.flatnonzero(values == kth)[:k - len(bigger)]])
+        else:
+            candidates = np.arange(len(values))
+        # ascending by value and descending by position, reversed
+        return candidates[np.lexsort((-candidates, values[candidates]))[::-1]]
+
+    @staticmethod
+    def Top_k(data: pd.DataFrame, column: str, k: int = None, by: str = None) -> pd.DataFrame:
+        """
+            Gets the rows with the k biggest values of a column, biggest first, without sorting the rest of the rows.
+            Gives the same rows, in the same order, as data.sort_values(column, ascending=False, kind='stable').head(k),
+            rows with a missing value are left out like in DataFrame.nlargest.
+
+            Args:
+                data (pandas.DataFrame): data to rank
+                column (str): numeric column to rank by
+                k (int): number of rows, None ranks every row
+                by (str): column of the groups, gets the k biggest rows of every group with the groups in sorted order, like groupby(by).head(k)
+
+            Returns:
+                pandas.DataFrame with the selected rows and their index
+        """
+        present = data[column].notna().to_numpy()
+        if not present.all():
+            data = data[present]
+        if by is None:
+            return data.iloc[Data.Top_k_positions(data[column].to_numpy(), k)]
+
+        # positions of the rows grouped in sorted order, only the selected rows are copied
+        codes, groups = pd.factorize(data[by], sort=True)
+        # numpy sorts 16 bit integers by radix, much faster for the few groups of a ranking
+        order = np.argsort(codes.astype(np.int16) if len(groups) < np.iinfo(np.int16).max else codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(groups))
+        # rows without group have code -1 and are sorted first
+        stops = np.cumsum(counts) + np.count_nonzero(codes < 0)
+        values = data[column].to_numpy()[order]
+        positions = [order[start + Data.Top_k_positions(values[start:stop], k)] for start, stop in zip(stops - counts, stops)]
+        return data.iloc[np.concatenate(positions) if positions else []]
+
+    def __Source(self, source: str) -> pd.DataFrame:
+        if source == 'asylum_data':
+            return self.asylum_data
+        if source == 'population_long':
+            return self.Get_population_long()
+        return self.Get_aggregate_view(source)
 
     @staticmethod
     def Peak_finder(data: pd.DataFrame):
@@ -37,60 +610,121 @@ class Data:
             Returns:
                 Generator, yields a dic structure {'start': int, 'end': int}
         """
+        yield from Data.Find_crisis_windows(data).to_dict('records')
 
-        MINIMUN_CONSIDERATION_VALUE = 1_000
-        CRISIS_INCREMENT_ALERT = 0.5 # Increments higher than this % are consider crisis
-        previous_value = data['count'][0]
-        previous_year = data['year'][0]
-
-        inside_peak = False
-        current_highlight = {}
-        data = data.sort_values('year')
-        # Start of the highlight:
-        for index, row in data.iterrows():
-            if not inside_peak:
-                if previous_value > MINIMUN_CONSIDERATION_VALUE: 
-                    if (row['count'] - previous_value) > (previous_value * CRISIS_INCREMENT_ALERT):
-                        current_highlight = {'start': previous_year, 'end': 0}
-                        inside_peak = True
-            else:
-                if (row['count']) < (previous_value):
-                    current_highlight['end'] = row['year']
-                    yield current_highlight
-                    inside_peak = False
-                    current_highlight = {}
-            previous_value = row['count']
-            previous_year = row['year']
+    @staticmethod
+    @instrumented
+    def Find_crisis_windows(data: pd.DataFrame, group_column: str = None) -> pd.DataFrame:
+        """
+            Finds the crisis windows of every series in a panel in one pass.
+            A crisis starts the year before the count grows more than CRISIS_INCREMENT_ALERT over a count bigger than
+            MINIMUN_CONSIDERATION_VALUE and ends the first following year the count decreases. Windows still open at the
+            end of a series are not reported.
+
+            Args:
+                data (pandas.DataFrame): that has a year series, a count series and optionally group_column
+                group_column (str): column that identifies each series, None when data is a single series
+
+            Returns:
+                pandas.DataFrame with group_column (if given), start and end
+        """
+        columns = ['start', 'end'] if group_column is None else [group_column, 'start', 'end']
+        sort_columns = ['year'] if group_column is None else [group_column, 'year']
+        data = data.sort_values(sort_columns, kind='stable')
+        if data.empty:
+            return pd.DataFrame(columns=columns)
+
+        years = data['year'].to_numpy()
+        counts = data['count'].to_numpy(dtype=float)
+        series_start = np.zeros(len(data), dtype=bool)
+        series_start[0] = True
+        if group_column is not None:
+            groups = data[group_column].to_numpy()
+            series_start[1:] = groups[1:] != groups[:-1]
+
+        # every row is compared with the previous year of its own series
+        previous = np.where(series_start, counts, np.roll(counts, 1))
+        rises = ~series_start & (previous > Data.MINIMUN_CONSIDERATION_VALUE) & ((counts - previous) > (previous * Data.CRISIS_INCREMENT_ALERT))
+        # a decrease closes the window, the start of a new series discards it
+        closes = np.flatnonzero((counts < previous) | series_start)
+
+        rises = np.flatnonzero(rises)
+        next_close = np.searchsorted(closes, rises, side='right')
+        # only the first rise before each close opens a window, the rest happen inside it
+        first_rise = np.ones(len(rises), dtype=bool)
+        first_rise[1:] = next_close[1:] != next_close[:-1]
+        rises, next_close = rises[first_rise], next_close[first_rise]
+        closed = next_close < len(closes)
+        rises, ends = rises[closed], closes[next_close[closed]]
+        decreased = ~series_start[ends]
+        rises, ends = rises[decreased], ends[decreased]
 
+        windows = pd.DataFrame({'start': years[rises - 1], 'end': years[ends]})
+        if group_column is not None:
+            windows.insert(0, group_column, groups[ends])
+        return windows
 
-    def top_origin_countries_yearly(self, start_year: int, end_year: int) -> pd.DataFrame:
+    @instrumented
+    def Get_crisis_windows(self) -> pd.DataFrame:
         """
-            Compares the all the countries and change the name of the country to 'Other' if its less than the constant minimum value 
+            Gets the crisis windows of every country of origin and asylum, computed once and reused until asylum_data changes
+
+            Returns:
+                pandas.DataFrame with type ('origin' or 'asylum'), country, start and end
+        """
+        return self.__Derived(('crisis_windows',), self.__Build_crisis_windows)
+
+    def __Build_crisis_windows(self) -> pd.DataFrame:
+        windows = []
+        for analisis_type in ['origin', 'asylum']:
+            TARGET_TYPE_COLUNM = 'country_of_' + analisis_type + '_abbr'
+            totals = self.asylum_data.groupby([TARGET_TYPE_COLUNM, 'year'], observed=True).agg({'count': 'sum'}).reset_index()
+            type_windows = self.Find_crisis_windows(totals, TARGET_TYPE_COLUNM).rename(columns={TARGET_TYPE_COLUNM: 'country'})
+            type_windows.insert(0, 'type', analisis_type)
+            windows.append(type_windows)
+        return pd.concat(windows, ignore_index=True)
+
+    @instrumented
+    @cached_query
+    def top_origin_countries_yearly(self, start_year: int, end_year: int, minimum_participation: float = 0.05) -> pd.DataFrame:
+        """
+            Compares the all the countries and change the name of the country to 'Other' if its less than the minimum participation of that year
 
             Args:
                 start_year (int): starting year of the period
                 end_year (int): ending year of the period
+                minimum_participation (float): share of the year total a country needs to keep its name
 
             Returns:
                 pandas.DataFrame with total migration contributing countries per year.
         """
-        MINIMUN_PARTICIPATION = 0.05
         df = self.asylum_data[(start_year <= self.asylum_data['year']) & (self.asylum_data['year'] <= end_year)]
 
-        years = df['year'].unique().tolist()
+        by_country = df.groupby(['country_of_origin_name', 'year'], observed=True).agg({'count': 'sum'}).reset_index()
+        share = by_country['count'] / by_country.groupby('year')['count'].transform('sum')
+        by_country['country_of_origin_name'] = by_country['country_of_origin_name'].astype(object).where(~(share < minimum_participation), 'Other')
 
-        for year in years:
-            yearly_df = df[df['year'] == year]
-            total_asylums = yearly_df['count'].sum()
-            countries = yearly_df['country_of_origin_name'].unique().tolist()
+        return by_country.groupby(['country_of_origin_name', 'year']).agg({'count': 'sum'}).reset_index()
 
-            for country in countries:
-                asylum_per_country = yearly_df[yearly_df['country_of_origin_name'] == country]['count'].sum()
-                if (asylum_per_country / total_asylums) < MINIMUN_PARTICIPATION:
-                    df.loc[(df['country_of_origin_name'] == country) & (df['year'] == year), 'country_of_origin_name'] = 'Other'
-        
-        return df.groupby(['country_of_origin_name', 'year']).agg({'count': 'sum'}).reset_index()
+    @instrumented
+    def Get_population_long(self) -> pd.DataFrame:
+        """
+            Gets the population table melted into one row per country and year, computed once and reused until population_data changes.
+            Years without population are left out.
 
+            Returns:
+                pandas.DataFrame with Country Code, year and population sorted by country and year
+        """
+        return self.__Derived(('population_long',), self.__Build_population_long)
+
+    def __Build_population_long(self) -> pd.DataFrame:
+        population = self.population_data.drop(columns=["Country Name"]).melt(id_vars="Country Code", var_name='year', value_name='population')
+        population = population.dropna(subset=['population'])
+        population['year'] = population['year'].astype(int)
+        return population.sort_values(['Country Code', 'year'], kind='stable').reset_index(drop=True)
+
+    @instrumented
+    @cached_query
     def Country_population_data(self, country_code: str) -> pd.DataFrame:
         """
             Gets country specific Dataframe with a timeline of the year population
@@ -101,11 +735,9 @@ class Data:
             Return:
                 pandas.DataFrame with year and population
         """
-        country_population = self.population_data[self.population_data["Country Code"] == country_code].drop(columns=["Country Name", "Country Code"]).transpose().reset_index()
-        country_population.columns = ['year', 'population']
-        country_population['year'] = country_population['year'].astype(int)
+        country_population = self.Get_rows_of(country_code, "Country Code", 'population_long')[['year', 'population']]
 
-        country = self.asylum_data[self.asylum_data["country_of_origin_abbr"] == country_code].groupby("year", as_index=False)["count"].sum()
+        country = self.Get_rows_of(country_code, "country_of_origin_abbr").groupby("year", as_index=False)["count"].sum()
         
         country = country.merge(right= country_population, how='left', on='year')
         country.drop(country[country['population'].isna()].index, inplace=True)
@@ -115,24 +747,30 @@ class Data:
         country["country_of_origin_abbr"] = country_code
         return country
 
+    @instrumented
     def Get_country_population_df(self) -> pd.DataFrame:
         """
-            Gets dataframe with the population for each country by year
+            Gets dataframe with the population for each country by year, joining every country at once.
+            Countries keep the order they have in asylum_data and the index counts the years of each country, like Country_population_data.
             
             Returns:
                 pandas.DataFrame with year and population
         """
-        countries = self.asylum_data["country_of_origin_abbr"].unique()
-        countries_not_in_the_analysis = []
-        full_data = pd.DataFrame()
-        for country in countries:
-            if country in self.population_data['Country Code'].values:
-                full_data = pd.concat([full_data, self.Country_population_data(country)])
-            else:
-                # countries not in the asylum DF
-                countries_not_in_the_analysis.append(self.asylum_data[self.asylum_data['country_of_origin_abbr'] == country]['country_of_origin_name'].iloc[0])
-        return full_data
+        population = self.Get_population_long().rename(columns={"Country Code": "country_of_origin_abbr"})
+
+        displaced = self.asylum_data.groupby(["country_of_origin_abbr", "year"], as_index=False, observed=True)["count"].sum()
+        countries = self.asylum_data["country_of_origin_abbr"].drop_duplicates().to_numpy(dtype=object)
+        countries_order = pd.Series(np.arange(len(countries)), index=countries)
+        displaced = displaced.iloc[displaced["country_of_origin_abbr"].astype(object).map(countries_order).argsort(kind='stable')]
+        position = displaced.groupby("country_of_origin_abbr", observed=True).cumcount()
 
+        full_data = displaced.assign(position=position.to_numpy()).merge(population, how='inner', on=["country_of_origin_abbr", "year"])
+        full_data["percentage_of_population_migration"] = (full_data["count"] / full_data["population"]) * 100
+        full_data = full_data.rename(columns={'count': "displaced"}).set_index('position')
+        full_data.index.name = None
+        return full_data[["year", "displaced", "population", "percentage_of_population_migration", "country_of_origin_abbr"]]
+
+    @instrumented
     def Get_destination_by_year(self, country_abbr: str) -> pd.DataFrame:
         """
             Returns a Dataframe that shows the destination of a specific country migration
@@ -141,17 +779,47 @@ class Data:
                 country_abbr (str): ISO-3 country code.
             
             Return:
-                pandas.DataFrame with year, population and adds a 'merge_column' with 'country_of_asylum_abbr' + 'year'
+                pandas.DataFrame with year, country_of_asylum_abbr and count
         """
-        result = self.asylum_data[self.asylum_data['country_of_origin_abbr'] == country_abbr]
-        result = result.groupby(['year', 'country_of_asylum_abbr']).agg({'count' : 'sum'}).reset_index()
-        result['merge_column'] = result['country_of_asylum_abbr'] + result['year'].astype(str)
+        result = self.Get_rows_of(country_abbr, 'country_of_origin_abbr')
+        result = result.groupby(['year', 'country_of_asylum_abbr'], observed=True).agg({'count' : 'sum'}).reset_index()
         return result
 
+    @staticmethod
+    @instrumented
+    def Build_country_year_panel(df: pd.DataFrame, country_column: str) -> pd.DataFrame:
+        """
+            Takes a DataFrame with a country column, year and count, and generates a record for each year for each country.
+            Rows are placed in a dense country x year array by their integer codes, missing years count 0.
+
+            Args:
+                df (pandas.DataFrame): DataFrame with country_column, year and count, repeated country and year pairs are added
+                country_column (str): name of the country column
+
+            Return:
+                pandas.DataFrame with country (in order of appearance), year (sorted), count and cumulative_sum
+
+        """
+        country_codes, countries = pd.factorize(df[country_column])
+        year_codes, years = pd.factorize(df['year'], sort=True)
+
+        # integer key of every row inside the dense panel
+        panel_position = country_codes * len(years) + year_codes
+        counts = np.bincount(panel_position, weights=df['count'].astype(np.int64), minlength=len(countries) * len(years))
+        counts = counts.astype(np.int64).reshape(len(countries), len(years))
+
+        return pd.DataFrame({
+            'country': np.repeat(np.asarray(countries), len(years)),
+            'year': np.tile(np.asarray(years), len(countries)),
+            'count': counts.ravel(),
+            'cumulative_sum': counts.cumsum(axis=1).ravel()
+        })
+
     @staticmethod
     def Get_countries_and_years_df(df: pd.DataFrame) -> pd.DataFrame:
         """
             Takes a DataFrame with country_of_asylum_abbr and year, gerates a record for each year for each country, also adds a 'merge_column' with 'country_of_asylum_abbr' + 'year'
+            Kept for compatibility, Build_country_year_panel builds the panel without the string column.
 
             Args:
                 df (pandas.DataFrame): DataFrame with country_of_asylum_abbr and year)
@@ -160,40 +828,32 @@ class Data:
                 pandas.DataFrame with year, population and merge_column
 
         """
-        countries = df['country_of_asylum_abbr'].unique()
-        years = df['year'].unique()
-        result = pd.DataFrame(columns=["country", "year"])
-        for country in countries:
-            c_list = [country] * len(years)
-            country_list_df = pd.DataFrame({"country" : c_list, "year" : years})
-            result = pd.concat([result, country_list_df], ignore_index=True)
+        result = pd.MultiIndex.from_product([df['country_of_asylum_abbr'].unique(), df['year'].unique()], names=["country", "year"]).to_frame(index=False)
         result['merge_column'] = result['country'] + result['year'].astype(str)
         return result
 
-    ## TODO: For loop at group by with if statement
     @staticmethod
     def Merge_and_clean_df(destination_df: pd.DataFrame, years_df: pd.DataFrame) -> pd.DataFrame:
         """
-            Merges and cleans the dataframes
+            Merges and cleans the dataframes on the country and year keys
 
             Args:
-                destination_df (pandas.DataFrame): DataFrame with country_of_asylum_abbr, year and merge_column)
-                years_df (pandas.DataFrame): DataFrame with year)
+                destination_df (pandas.DataFrame): DataFrame with country_of_asylum_abbr, year and count)
+                years_df (pandas.DataFrame): DataFrame with country and year)
 
             Return:
-                pandas.DataFrame with 
+                pandas.DataFrame with country, year, count and cumulative_sum
 
         """
-
-        final = years_df.merge(destination_df, on='merge_column', how='left')
-        final[final['year_x'] != final['year_y']]
-        final = final.drop(columns=['year_y', 'merge_column', 'country_of_asylum_abbr'])
-        final = final.rename(columns={'year_x': 'year'})
+        destination_df = destination_df[['country_of_asylum_abbr', 'year', 'count']].rename(columns={'country_of_asylum_abbr': 'country'})
+        final = years_df[['country', 'year']].merge(destination_df, on=['country', 'year'], how='left')
         final['count'] = final['count'].fillna(0)
         final['count'] = final['count'].astype(int)
         final['cumulative_sum'] = final.groupby('country')['count'].cumsum()
         return final
 
+    @instrumented
+    @cached_query
     def Get_ready_for_plot_df(self, country_of_origin_abbr: str) -> pd.DataFrame:
         """
             Returns a Dataframe with all the destionations of a specific country_of_origin
@@ -204,12 +864,89 @@ class Data:
             Return:
                 pandas.DataFrame with country, year, count, cumulative_sum and hover_text
         """
+        if ('ready_for_plot_all',) in self.__derived:
+            # already computed for every origin by Get_ready_for_plot_all
+            panels = self.Get_ready_for_plot_all()
+            if country_of_origin_abbr in panels:
+                return panels[country_of_origin_abbr]
+        return self.__Build_ready_for_plot_df(country_of_origin_abbr)
+
+    def __Build_ready_for_plot_df(self, country_of_origin_abbr: str) -> pd.DataFrame:
         destination = self.Get_destination_by_year(country_of_origin_abbr)
-        yearly = self.Get_countries_and_years_df(destination)
-        combined = self.Merge_and_clean_df(destination, yearly)
+        combined = self.Build_country_year_panel(destination, 'country_of_asylum_abbr')
         combined['country_name'] = combined['country'].map(self.abbr_dict)
         combined['hover_text'] = combined['country_name'] + ': ' + combined['cumulative_sum'].astype(str)
-        return combined   
+        return combined
+
+    @instrumented
+    def Get_ready_for_plot_all(self) -> dict:
+        """
+            Computes Get_ready_for_plot_df for every country of origin in one pass, kept until asylum_data changes.
+            Once computed, Get_ready_for_plot_df reads from it.
+
+            Returns:
+                dict ISO-3 code of origin -> pandas.DataFrame like Get_ready_for_plot_df, the DataFrames must not be modified
+        """
+        return self.__Derived(('ready_for_plot_all',), self.__Build_ready_for_plot_all)
+
+    def __Build_ready_for_plot_all(self) -> dict:
+        totals = self.asylum_data.groupby(['country_of_origin_abbr', 'year', 'country_of_asylum_abbr'], observed=True)['count'].sum().reset_index()
+        if totals.empty:
+            return {}
+
+        # the rows are sorted by origin, so the ids of the (origin, destination) and (origin, year) pairs, numbered by first appearance,
+        # are contiguous for every origin, destinations in the order of Get_destination_by_year and years sorted
+        origin_codes, origins = pd.factorize(totals['country_of_origin_abbr'])
+        asylum_codes, asylums = pd.factorize(totals['country_of_asylum_abbr'])
+        year_codes, years = pd.factorize(totals['year'])
+        pair_codes, _ = pd.factorize(origin_codes.astype(np.int64) * len(asylums) + asylum_codes)
+        origin_year_codes, _ = pd.factorize(origin_codes.astype(np.int64) * len(years) + year_codes)
+
+        destinations_per_origin = np.bincount(origin_codes[np.unique(pair_codes, return_index=True)[1]], minlength=len(origins))
+        years_per_origin = np.bincount(origin_codes[np.unique(origin_year_codes, return_index=True)[1]], minlength=len(origins))
+        first_pair = np.cumsum(destinations_per_origin) - destinations_per_origin
+        first_origin_year = np.cumsum(years_per_origin) - years_per_origin
+        panel_sizes = destinations_per_origin * years_per_origin
+        panel_starts = np.cumsum(panel_sizes) - panel_sizes
+
+        # every origin has a destination x year block, rows of one destination are consecutive years
+        position = (panel_starts[origin_codes] + (pair_codes - first_pair[origin_codes]) * years_per_origin[origin_codes]
+                    + origin_year_codes - first_origin_year[origin_codes])
+        counts = np.bincount(position, weights=totals['count'].astype(np.int64), minlength=panel_sizes.sum()).astype(np.int64)
+
+        pair_asylum = np.empty(destinations_per_origin.sum(), dtype=np.int64)
+        pair_asylum[pair_codes] = asylum_codes
+        origin_year_values = np.empty(years_per_origin.sum(), dtype=np.int64)
+        origin_year_values[origin_year_codes] = year_codes
+
+        pair_years = np.repeat(years_per_origin, destinations_per_origin)
+        row_origin = np.repeat(np.arange(len(origins)), panel_sizes)
+        row_pair = np.repeat(np.arange(len(pair_asylum)), pair_years)
+        row_year = first_origin_year[row_origin] + (np.arange(len(counts)) - panel_starts[row_origin]) % years_per_origin[row_origin]
+
+        # cumulative sum restarted at the first year of every destination
+        cumulative_sum = counts.cumsum()
+        pair_starts = np.cumsum(pair_years) - pair_years
+        cumulative_sum -= np.repeat(np.concatenate([[0], cumulative_sum])[pair_starts], pair_years)
+
+        panel = pd.DataFrame({
+            'country': np.asarray(asylums)[pair_asylum[row_pair]],
+            'year': np.asarray(years)[origin_year_values[row_year]],
+            'count': counts,
+            'cumulative_sum': cumulative_sum
+        })
+        panel['country_name'] = panel['country'].map(self.abbr_dict)
+        # the panel repeats the same names and sums a lot, the text of every distinct pair is formatted once, without name there is no text
+        name_codes, names = pd.factorize(panel['country_name'])
+        sum_codes, sums = pd.factorize(panel['cumulative_sum'])
+        text_codes, texts = pd.factorize(name_codes.astype(np.int64) * len(sums) + sum_codes)
+        texts = np.array([f"{names[text // len(sums)]}: {sums[text % len(sums)]}" if text >= 0 else np.nan for text in texts], dtype=object)
+        panel['hover_text'] = texts[text_codes]
+
+        return {
+            origin: panel.iloc[start:start + size].reset_index(drop=True)
+            for origin, start, size in zip(np.asarray(origins), panel_starts, panel_sizes)
+        }
     
     """
         How to test time in hovertext
@@ -219,60 +956,87 @@ class Data:
         testing text creation
     """
     
+    @instrumented
     def Add_hover_text(self, df: pd.DataFrame, analisis_type: str) -> pd.DataFrame:
-        if analisis_type == 'origin':
-            COLUMN_NAME = 'country_of_asylum_name'
-            result_countries = 'destination'
-            TOTAL_DESCRIPTION = 'Displaced population:'
-        else:
-            COLUMN_NAME = 'country_of_origin_name'
-            result_countries = 'origin'
-            TOTAL_DESCRIPTION = 'Asylum seekers received:'
+        """
+            Creates the hover text of every row, looking up the top partner countries in the precomputed index
 
-        r = df
-        result = pd.DataFrame({'hover_text': []})
-        for row in r.itertuples(): # TODO: try writing this in vectorization to be more efficient
-            text = capture(self.text_creation)
-            self.time_df['df_and_text'].append(timeit.timeit(lambda: text(row, COLUMN_NAME, TOTAL_DESCRIPTION, result_countries, analisis_type), number=1))
-            result.loc[row[0]] = [text.return_value]
+            Args:
+                df (pandas.DataFrame): DataFrame with country, year and cumulative_sum
+                analisis_type (str): 'origin' or 'asylum'
 
-            # result.loc[row[0]] = self.text_creation(row, COLUMN_NAME, TOTAL_DESCRIPTION, result_countries, analisis_type)
-        return result   
+            Returns:
+                pandas.DataFrame with hover_text, sharing the index of df
+        """
+        TOTAL_DESCRIPTION, result_countries = self.HOVER_TITLES[analisis_type]
 
-    def text_creation(self, row: tuple, COLUMN_NAME: str, TOTAL_DESCRIPTION: str, result_countries: str, analisis_type: str) -> str:
-        country = row.country # country of destionation or origin
-        # gets all the times that country has been use as origin or destination
-        inverse_df = capture(self.inverse_df_result)
-        self.time_df['inverse_df'].append(timeit.timeit(lambda: inverse_df(row, COLUMN_NAME, analisis_type, country), number=1))
-        specific_type_df = inverse_df.return_value
+        top_partners = self.Get_top_partners_index(analisis_type)['top_partners']
+        top_partners = top_partners.reindex(pd.MultiIndex.from_arrays([df['country'], df['year']])).fillna('')
+
+        hover_text = [
+            f'<b>{self.abbr_dict[country]}<br>{TOTAL_DESCRIPTION} {int(total):,}<br><br>Top {result_countries} countries:</b><br>{partners}'
+            for country, total, partners in zip(df['country'], df['cumulative_sum'], top_partners)
+        ]
+        return pd.DataFrame({'hover_text': hover_text}, index=df.index)
+
+    @instrumented
+    def Get_top_partners_index(self, analisis_type: str) -> pd.DataFrame:
+        """
+            Gets the cumulative top partner countries of every country for every year, computed once and reused until asylum_data changes.
+            Partners are the countries of asylum when analisis_type is 'origin', otherwise the countries of origin.
+
+            Args:
+                analisis_type (str): 'origin' or 'asylum'
+
+            Returns:
+                pandas.DataFrame indexed by country and year with the html lines of the top partners in 'top_partners'
+        """
+        return self.__Derived(('top_partners', analisis_type), lambda: self.__Build_top_partners_index(analisis_type))
+
+    def __Build_top_partners_index(self, analisis_type: str) -> pd.DataFrame:
+        COUNTRY_COLUMN = 'country_of_' + analisis_type + '_abbr'
+        COLUMN_NAME = 'country_of_asylum_name' if analisis_type == 'origin' else 'country_of_origin_name'
+
+        # one row per country and partner, one column per year
+        yearly = self.asylum_data.groupby([COUNTRY_COLUMN, COLUMN_NAME, 'year'], observed=True)['count'].sum().unstack('year')
+        # partners only count from the first year they appear in
+        cumulative = yearly.fillna(0).cumsum(axis=1).where(yearly.notna().cumsum(axis=1) > 0)
+        cumulative = cumulative.reset_index().melt(id_vars=[COUNTRY_COLUMN, COLUMN_NAME], var_name='year', value_name='count')
+        cumulative = cumulative.dropna(subset=['count'])
+
+        cumulative = cumulative.sort_values([COUNTRY_COLUMN, 'year', 'count', COLUMN_NAME], ascending=[True, True, False, True], kind='stable')
+        top = cumulative.groupby([COUNTRY_COLUMN, 'year'], observed=True).head(self.MAX_DISPLAY_COUNTRIES)
+        top = top.assign(line=[f'{partner}: {int(count):,}<br>' for partner, count in zip(top[COLUMN_NAME], top['count'])])
 
-        # specific_type_df = self.inverse_df_result(row, COLUMN_NAME, analisis_type, country)
+        index = top.groupby([COUNTRY_COLUMN, 'year'], observed=True)['line'].agg(''.join).to_frame('top_partners')
+        index.index.names = ['country', 'year']
+        return index
 
-        typer_machine = capture(self.typer)
-        self.time_df['text'].append(timeit.timeit(lambda: typer_machine(country, TOTAL_DESCRIPTION, result_countries, analisis_type, COLUMN_NAME, specific_type_df, row), number=1))
-        return typer_machine.return_value
-        # return self.typer(country, TOTAL_DESCRIPTION, result_countries, analisis_type, COLUMN_NAME, specific_type_df, row)
+    def text_creation(self, row: tuple, COLUMN_NAME: str, TOTAL_DESCRIPTION: str, result_countries: str, analisis_type: str) -> str:
+        country = row.country # country of destionation or origin
+        # gets all the times that country has been use as origin or destination, both steps are timed by their spans
+        specific_type_df = self.inverse_df_result(row, COLUMN_NAME, analisis_type, country)
+        return self.typer(country, TOTAL_DESCRIPTION, result_countries, analisis_type, COLUMN_NAME, specific_type_df, row)
     
+    @instrumented
     def inverse_df_result(self, row: tuple, COLUMN_NAME: str, analisis_type: str, country: str) -> pd.DataFrame:
         # lets extract this outside the loop.
 
         # working code
         # is it better to compute this before the loop and hold more ram or compute during the loop?
-        specific_type_df = self.asylum_data[self.asylum_data['country_of_' + analisis_type + '_abbr'] == country]
+        specific_type_df = self.Get_rows_of(country, 'country_of_' + analisis_type + '_abbr')
         specific_type_df = specific_type_df[specific_type_df['year'] <= row.year] # selects the year as the maximun year
-        specific_type_df = specific_type_df.groupby([COLUMN_NAME]).agg({'count': 'sum'}).reset_index() # sums all the users
-        specific_type_df = specific_type_df.sort_values('count', ascending=False) # this first part can be precomputed before the loop starts
+        specific_type_df = specific_type_df.groupby([COLUMN_NAME], observed=True).agg({'count': 'sum'}).reset_index() # sums all the users
+        # typer only ranks the countries it displays, see Top_k
 
         return specific_type_df
     
+    @instrumented
     def typer(self, country: str, TOTAL_DESCRIPTION: str, result_countries: str, analisis_type: str, COLUMN_NAME: str, specific_type_df: pd.DataFrame, row: tuple) -> str:
         hover_text = f'''<b>{self.abbr_dict[country]}<br>{TOTAL_DESCRIPTION} {int(row.cumulative_sum):,}<br><br>Top {result_countries} countries:</b><br>'''
-        MAX_DISPLAY_COUNTRIES = 5
-        number_of_countries_to_display =  MAX_DISPLAY_COUNTRIES if len(specific_type_df) >= MAX_DISPLAY_COUNTRIES else len(specific_type_df)
-        i = 0
-        while i < number_of_countries_to_display:
-            hover_text += f'{specific_type_df.iloc[i][COLUMN_NAME]}: {specific_type_df.iloc[i]['count']:,}<br>'
-            i += 1
+        top_countries = self.Top_k(specific_type_df, 'count', self.MAX_DISPLAY_COUNTRIES)
+        for partner, count in zip(top_countries[COLUMN_NAME], top_countries['count']):
+            hover_text += f'{partner}: {count:,}<br>'
 
         return hover_text
 
@@ -286,67 +1050,130 @@ class Data:
                 df (pandas.DataFrame): DataFrame with country and year)
             
             Return:
-                pandas.DataFrame with year, population and merge_column
+                pandas.DataFrame with country and year
 
         """
-        countries = df['country'].unique()
-        years = df['year'].unique()
-        result = pd.DataFrame(columns=["country", "year"])
-        for country in countries:
-            c_list = [country] * len(years)
-            country_list_df = pd.DataFrame({"country" : c_list, "year" : years})
-            result = pd.concat([result, country_list_df], ignore_index=True)
-        return result
+        return pd.MultiIndex.from_product([df['country'].unique(), df['year'].unique()], names=["country", "year"]).to_frame(index=False)
 
-    def Destination_or_origin_by_year(self, type: str) -> pd.DataFrame:
+    @instrumented
+    def Destination_or_origin_by_year(self, type: str, hover_text: bool = True) -> pd.DataFrame:
+        """
+            Gets the cumulative sum of every country of origin or of asylum by year, for the animated maps
+
+            Args:
+                type (str): 'origin' or 'asylum'
+                hover_text (bool): adds the hover_text column, see Add_hover_text, the compact maps build their own from the top partners
+
+            Returns:
+                pandas.DataFrame with country, year, count, cumulative_sum and hover_text
+        """
         # prepares data
         TARGET_TYPE_COLUNM = 'country_of_' + type +'_abbr'
-        df_with_total_by_year = self.asylum_data.groupby(['year', TARGET_TYPE_COLUNM]).agg({'count' : 'sum'}).reset_index()
-        df_with_total_by_year.rename(columns={TARGET_TYPE_COLUNM: 'country'}, inplace=True)
-        # Generate dataframe with every year for every country
-        one_year_for_each_country_df = self.Get_df_with_a_year_per_country(df_with_total_by_year)
-        # Merge the two dataframes
-        cumutalive_data = one_year_for_each_country_df.merge(df_with_total_by_year, on=['country', 'year'], how='left')
-        cumutalive_data['count'] = cumutalive_data['count'].fillna(0)
-        cumutalive_data['cumulative_sum'] = cumutalive_data.groupby('country')['count'].cumsum()
+        df_with_total_by_year = self.asylum_data.groupby(['year', TARGET_TYPE_COLUNM], observed=True).agg({'count' : 'sum'}).reset_index()
+        # every year for every country with its cumulative sum
+        cumutalive_data = self.Build_country_year_panel(df_with_total_by_year, TARGET_TYPE_COLUNM)
         cumutalive_data = cumutalive_data[cumutalive_data['cumulative_sum'] != 0]
-        cumutalive_data = cumutalive_data.join(self.Add_hover_text(cumutalive_data, type))
+        if hover_text:
+            cumutalive_data = cumutalive_data.join(self.Add_hover_text(cumutalive_data, type))
 
         return cumutalive_data
     ## /
 
+    @instrumented
+    @cached_query
     def Get_total_country_migration_df(self, country_of_origin_abbr: str) -> pd.DataFrame:
-        return self.asylum_data[self.asylum_data['country_of_origin_abbr'] == country_of_origin_abbr].groupby('year').agg({'count' : 'sum'}).reset_index()
+        by_origin_year = self.Get_rows_of(country_of_origin_abbr, 'country_of_origin_abbr', 'by_origin_year')
+        return by_origin_year.groupby('year').agg({'count' : 'sum'}).reset_index()
+
+    @instrumented
+    def Get_origin_codes(self) -> dict:
+        """
+            Gets the ISO-3 code of every country of origin name, kept until asylum_data changes
+
+            Returns:
+                dict country of origin name -> ISO-3 code
+        """
+        return self.__Derived(('origin_codes',), self.__Build_origin_codes)
+
+    def __Build_origin_codes(self) -> dict:
+        country_names = self.Get_aggregate_view('by_origin')[['country_of_origin_name', 'country_of_origin_abbr']].dropna()
+        country_names = country_names.drop_duplicates(subset=['country_of_origin_name'], keep='first')
+        return dict(zip(country_names['country_of_origin_name'], country_names['country_of_origin_abbr']))
+
+    @instrumented
+    @cached_query
+    def Get_country_summary(self, country_of_origin_abbr: str) -> dict:
+        """
+            Computes once everything the graphs of a country of origin need, so the callbacks of a selection share the work
+
+            Args:
+                country_of_origin_abbr (str): ISO-3 country code.
+
+            Returns:
+                dict with ready_for_plot (Get_ready_for_plot_df), timeline (Get_total_country_migration_df)
+                and crisis_windows (start and end of its crisis windows as origin), they must not be modified
+        """
+        crisis_windows = self.Get_crisis_windows()
+        crisis_windows = crisis_windows[(crisis_windows['type'] == 'origin') & (crisis_windows['country'] == country_of_origin_abbr)]
+        return {
+            'ready_for_plot': self.Get_ready_for_plot_df(country_of_origin_abbr),
+            'timeline': self.Get_total_country_migration_df(country_of_origin_abbr),
+            'crisis_windows': crisis_windows[['start', 'end']].reset_index(drop=True),
+        }
+
+    @instrumented
+    def Get_origin_totals(self) -> pd.DataFrame:
+        """
+            Gets the total asylum seekers of every country of origin, kept until asylum_data changes, to rank with Top_k
+
+            Returns:
+                pandas.DataFrame with country_of_origin_name and count, in name order, it must not be modified
+        """
+        return self.__Derived(('origin_totals',), lambda: self.Get_aggregate_view('by_origin').groupby('country_of_origin_name', observed=True).agg({'count': 'sum'}).reset_index())
+
+    @instrumented
+    def Get_origin_year_totals(self) -> pd.DataFrame:
+        """
+            Gets the asylum seekers of every country of origin by year, kept until asylum_data changes, to rank with Top_k
+
+            Returns:
+                pandas.DataFrame with country_of_origin_name, year and count, in name and year order, it must not be modified
+        """
+        return self.__Derived(('origin_year_totals',), lambda: self.Get_aggregate_view('by_origin_year').groupby(['country_of_origin_name', 'year'], observed=True).agg({'count': 'sum'}).reset_index())
 
+    @instrumented
     def Get_origin_country_total(self) -> pd.DataFrame:
-        return  self.asylum_data.groupby('country_of_origin_name').agg({'count': 'sum'}).sort_values('count', ascending=True).reset_index()
+        return  self.Get_origin_totals().sort_values('count', ascending=True).reset_index(drop=True)
     
+    @instrumented
     def Get_year_timeline(self) -> pd.DataFrame:
-        return self.asylum_data.groupby('year').agg({'count': 'sum'}).reset_index()
+        return self.Get_aggregate_view('by_year').groupby('year').agg({'count': 'sum'}).reset_index()
 
+    @instrumented
     def Get_grouped_by_year_countries_total_origin(self):
         # "By default the group keys are sorted during the groupby operation." Pandas docs https://pandas.pydata.org/pandas-docs/stable/user_guide/groupby.html
-        origin_country_total_by_year = self.asylum_data.groupby(['country_of_origin_name', 'year']).agg({'count': 'sum'})
-        origin_country_total_by_year = origin_country_total_by_year.reset_index().sort_values('count', ascending=False)
+        origin_country_total_by_year = self.Get_origin_year_totals().sort_values('count', ascending=False)
         grouped_by_year = origin_country_total_by_year.groupby('year')
         return grouped_by_year
     
+    @instrumented
     def Get_destination_countries(self) -> pd.DataFrame:
-        destination_countries = self.asylum_data.groupby("country_of_asylum_abbr").agg({"count":'sum'}).reset_index().sort_values('count', ascending=False)
-        country_names = self.asylum_data[['country_of_asylum_abbr', 'country_of_asylum_name']]
+        by_asylum = self.Get_aggregate_view('by_asylum')
+        destination_countries = by_asylum.groupby("country_of_asylum_abbr", observed=True).agg({"count":'sum'}).reset_index().sort_values('count', ascending=False)
+        country_names = by_asylum[['country_of_asylum_abbr', 'country_of_asylum_name']]
         country_names = country_names.drop_duplicates(subset=['country_of_asylum_abbr'], keep='first')
         destination_countries = destination_countries.merge(country_names, how='inner', on='country_of_asylum_abbr')
         return destination_countries
     
+    @instrumented
     def Get_biggest_population_displacement_df(self) -> pd.DataFrame:
         AMOUNT_OF_COUNTRIES = 20
-        data = self.Get_country_population_df().sort_values('percentage_of_population_migration', ascending=False)
+        data = self.Top_k(self.Get_country_population_df(), 'percentage_of_population_migration', AMOUNT_OF_COUNTRIES)
         country_names = self.asylum_data[['country_of_origin_abbr', 'country_of_origin_name']].drop_duplicates(subset=['country_of_origin_abbr'], keep='first')
         destination_countries = data.merge(country_names, how='left', on='country_of_origin_abbr')
-        destination_countries = destination_countries[:AMOUNT_OF_COUNTRIES]
         # Filter to show only the year with the highest percentage of population migration for each country
         filtered_data = destination_countries.loc[
-            destination_countries.groupby('country_of_origin_abbr')['percentage_of_population_migration'].idxmax()
+            destination_countries.groupby('country_of_origin_abbr', observed=True)['percentage_of_population_migration'].idxmax()
         ].sort_values(by='percentage_of_population_migration', ascending=False)
         filtered_data['country_of_origin_abbr'] = filtered_data['country_of_origin_abbr'].map(self.abbr_dict)
         return filtered_data
\ No newline at end of file
@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import os
+import threading
+import plotly.graph_objects as go
+
+
+class FigureCache:
+    """
+        On-disk cache of Plotly figures serialized as JSON, keyed by dashboard, selection and data token.
+        The figures are given back as the JSON text, without parsing it, for the Dash callbacks to send as is.
+    """
+    DEFAULT_FOLDER = ".\\Data\\Figures\\"
+
+    def __init__(self, folder: str = DEFAULT_FOLDER):
+        """
+            Args:
+                folder (str): folder of the cached figures
+        """
+        self.folder = folder
+        self.hits = 0
+        self.misses = 0
+        # the pre-rendering threads and the callbacks share the counters
+        self.__lock = threading.Lock()
+
+    def path(self, dashboard: str, selection: str, data_token: str) -> str:
+        key = hashlib.sha1(f"{dashboard}|{selection}|{data_token}".encode('utf-8')).hexdigest()
+        return f"{self.folder}{dashboard}_{key}.json"
+
+    def get(self, dashboard: str, selection: str, data_token: str):
+        """
+            Reads a cached figure
+
+            Args:
+                dashboard (str): name of the dashboard
+                selection (str): selected option, like a country or a period
+                data_token (str): token of the data the figure was built from
+
+            Returns:
+                str with the JSON of the figure, None when it is not cached
+        """
+        try:
+            with open(self.path(dashboard, selection, data_token), encoding='utf-8') as file:
+                figure = file.read()
+        except FileNotFoundError:
+            with self.__lock:
+                self.misses += 1
+            return None
+        with self.__lock:
+            self.hits += 1
+        return figure
+
+    def put(self, dashboard: str, selection: str, data_token: str, figure: go.Figure) -> str:
+        """
+            Writes a figure, replacing the file at once so readers never see a partial figure
+
+            Args:
+                dashboard (str): name of the dashboard
+                selection (str): selected option, like a country or a period
+                data_token (str): token of the data the figure was built from
+                figure (plotly.graph_objects.Figure): figure to cache
+
+            Returns:
+                str with the JSON of the figure written
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path(dashboard, selection, data_token)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        figure_json = figure.to_json()
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(figure_json)
+        os.replace(temporary_path, path)
+        return figure_json
+
+    def get_or_create(self, dashboard: str, selection: str, data_token: str, builder):
+        """
+            Gets a cached figure, building and caching it when it is missing.
+            Without data token the data can not be identified and the figure is always built.
+
+            Args:
+                dashboard (str): name of the dashboard
+                selection (str): selected option, like a country or a period
+                data_token (str): token of the data, see Data.Get_data_token
+                builder (callable): function without arguments that builds the figure
+
+            Returns:
+                str with the JSON of the cached figure or of the one just built
+        """
+        if data_token is None:
+            return builder().to_json()
+        figure = self.get(dashboard, selection, data_token)
+        if figure is None:
+            figure = self.put(dashboard, selection, data_token, builder())
+        return figure
+
+    def clear(self) -> None:
+        for path in glob.glob(f"{glob.escape(self.folder)}*.json"):
+            os.remove(path)
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+import numpy as np
+
+
+class Histogram:
+    """
+        Thread safe histogram of durations, keeps the count and total of every sample and the last max_samples for the percentiles
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        """
+            Args:
+                max_samples (int): number of most recent samples used for the percentiles
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.__samples = deque(maxlen=max_samples)
+        self.__lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.__lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.__samples.append(seconds)
+
+    def summary(self) -> dict:
+        """
+            Returns:
+                dict with count, total, mean, max and the p50, p95 and p99 of the recent samples, in seconds
+        """
+        with self.__lock:
+            samples = np.fromiter(self.__samples, dtype=float, count=len(self.__samples))
+            count, total, maximum = self.count, self.total, self.max
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if len(samples) else (0.0, 0.0, 0.0)
+        return {'count': count, 'total': total, 'mean': total / count if count else 0.0, 'max': maximum,
+                'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+class Instrumentation:
+    """
+        Process wide registry of the span histograms.
+        Off by default, set the ASYLUM_INSTRUMENTATION environment variable to 1 or call Enable, while off the spans only check enabled.
+    """
+    enabled = os.environ.get('ASYLUM_INSTRUMENTATION', '0') == '1'
+    max_samples = 1024
+    __histograms = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def Enable(cls, max_samples: int = None) -> None:
+        if max_samples is not None:
+            cls.max_samples = max_samples
+        cls.enabled = True
+
+    @classmethod
+    def Disable(cls) -> None:
+        cls.enabled = False
+
+    @classmethod
+    def Record(cls, name: str, seconds: float) -> None:
+        histogram = cls.__histograms.get(name)
+        if histogram is None:
+            with cls.__lock:
+                histogram = cls.__histograms.setdefault(name, Histogram(cls.max_samples))
+        histogram.record(seconds)
+
+    @classmethod
+    def Snapshot(cls) -> dict:
+        """
+            Returns:
+                dict span name -> summary of its histogram, see Histogram.summary
+        """
+        with cls.__lock:
+            histograms = dict(cls.__histograms)
+        return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+    @classmethod
+    def Reset(cls) -> None:
+        with cls.__lock:
+            cls.__histograms.clear()
+
+    @classmethod
+    def Export_json(cls, file_path: str) -> None:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(cls.Snapshot(), file, indent=2)
+
+    @classmethod
+    def Register_endpoint(cls, server, route: str = '/instrumentation') -> None:
+        """
+            Serves the snapshot as JSON from a Flask server, like the server of a Dash app
+
+            Args:
+                server (flask.Flask): server, Dash app.server
+                route (str): url of the endpoint
+        """
+        server.add_url_rule(route, 'instrumentation', lambda: server.response_class(json.dumps(cls.Snapshot()), mimetype='application/json'))
+
+
+class span:
+    """
+        Times a block into the histogram of name when the instrumentation is enabled
+
+        with span('Data.load'):
+            ...
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if Instrumentation.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        if self.start is not None:
+            Instrumentation.Record(self.name, time.perf_counter() - self.start)
+
+
+def instrumented(function=None, name: str = None):
+    """
+        Times every call of a function into the histogram of name, by default its qualified name like 'Data.Get_year_timeline'.
+        While the instrumentation is disabled the call goes straight to the function.
+    """
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not Instrumentation.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                Instrumentation.Record(span_name, time.perf_counter() - start)
+        return wrapper
+
+    if function is not None:
+        return decorator(function)
+    return decorator
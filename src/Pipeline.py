@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .Cleaner import Cleaner
+
+DEFAULT_OUTPUT_FOLDER = ".\\Data\\Clean\\"
+DEFAULT_POPULATION_SOURCE = ".\\Data\\Raw\\API_SP.POP.TOTL_DS2_en_csv_v2_87.csv"
+
+
+def Run_stage(stage: str, source_path: str, output_folder: str, chunk_size: int = None, full: bool = False) -> dict:
+    """
+        Runs one cleaning stage, in a worker process of the pipeline
+
+        Args:
+            stage (str): 'asylum' or 'population'
+            source_path (str): raw data of the stage
+            output_folder (str): folder of the clean data
+            chunk_size (int): rows per chunk when streaming the asylum data, None reads the whole sheet
+            full (bool): rebuilds everything instead of only what changed since the last run
+
+        Returns:
+            dict with the stage, its seconds and what was rebuilt
+    """
+    cleaner = Cleaner(output_folder)
+    start = time.perf_counter()
+    if stage == 'asylum':
+        if full:
+            cleaner.Output_asylum_seekers_clean_data(source_path, chunk_size)
+            result = 'rebuilt'
+        else:
+            years = cleaner.Update_asylum_seekers_clean_data(source_path, chunk_size)
+            result = f"{len(years)} years rebuilt" if years else 'up to date'
+    elif stage == 'population':
+        if full:
+            cleaner.Output_population_clean_data(source_path)
+            result = 'rebuilt'
+        else:
+            result = 'rebuilt' if cleaner.Update_population_clean_data(source_path) else 'up to date'
+    else:
+        raise ValueError(f"unknown stage {stage}")
+    return {'stage': stage, 'seconds': time.perf_counter() - start, 'result': result}
+
+
+def main(argv: list = None) -> int:
+    """
+        Cleans the asylum and population data at the same time, one process per stage.
+        Usage: python -m src.Pipeline --asylum WORKBOOK [--population CSV] [--output FOLDER] [--chunk-size N] [--full] [--workers N]
+
+        Returns:
+            0 when every stage succeeded, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(description='Cleans the raw asylum and population data into the clean data folder')
+    parser.add_argument('--asylum', required=True, help='UNHCR workbook, or csv export of its DATA sheet with --chunk-size')
+    parser.add_argument('--population', default=DEFAULT_POPULATION_SOURCE, help='World Bank population csv')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_FOLDER, help='folder of the clean data, ending with a separator')
+    parser.add_argument('--chunk-size', type=int, default=None, help='streams the asylum data this many rows at a time')
+    parser.add_argument('--full', action='store_true', help='rebuilds everything, ignoring the manifests of the last run')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='maximum number of processes')
+    args = parser.parse_args(argv)
+
+    stages = {'asylum': args.asylum, 'population': args.population}
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers or 1, len(stages)))) as executor:
+        futures = {
+            executor.submit(Run_stage, stage, source_path, args.output, args.chunk_size, args.full): stage
+            for stage, source_path in stages.items()
+        }
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception:
+                failed.append(futures[future])
+                print(f"{futures[future]:<12} FAILED", file=sys.stderr)
+                traceback.print_exc()
+                continue
+            print(f"{report['stage']:<12} {report['seconds']:>8.2f}s  {report['result']}", flush=True)
+
+    print(f"{'total':<12} {time.perf_counter() - start:>8.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+import traceback
+
+
+class Prerenderer:
+    """
+        Background pool of daemon threads running rendering tasks in the order they are given, so the first ones are ready first.
+        Starting it returns at once, the tasks run next to the requests of the server and never block them.
+    """
+
+    def __init__(self, tasks: list, workers: int = 2, stats=None):
+        """
+            Args:
+                tasks (list): tuples (name, callable without arguments), from the most to the least wanted
+                workers (int): maximum number of tasks running at the same time
+                stats (callable): function without arguments returning a dict added to the progress, like the hits and misses of the caches
+        """
+        self.workers = max(1, workers)
+        self.total = len(tasks)
+        self.done = 0
+        self.failed = []
+        self.started = None
+        self.finished = None
+        self.__stats = stats
+        self.__tasks = iter(tasks)
+        self.__threads = []
+        self.__stopped = threading.Event()
+        self.__lock = threading.Lock()
+
+    def start(self) -> 'Prerenderer':
+        if self.started is None:
+            self.started = time.perf_counter()
+            self.__threads = [threading.Thread(target=self.__Work, name=f"prerender-{index}", daemon=True) for index in range(self.workers)]
+            for thread in self.__threads:
+                thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+            Stops taking tasks, the running ones finish
+        """
+        self.__stopped.set()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+            Waits for the tasks to finish
+
+            Args:
+                timeout (float): maximum seconds to wait for each thread, None waits until they finish
+
+            Returns:
+                True when every thread finished
+        """
+        for thread in self.__threads:
+            thread.join(timeout)
+        return not any(thread.is_alive() for thread in self.__threads)
+
+    def __Next_task(self):
+        with self.__lock:
+            if self.__stopped.is_set():
+                return None
+            return next(self.__tasks, None)
+
+    def __Work(self) -> None:
+        task = self.__Next_task()
+        while task is not None:
+            name, render = task
+            try:
+                render()
+            except Exception:
+                self.failed.append(name)
+                traceback.print_exc()
+            with self.__lock:
+                self.done += 1
+                if self.done == self.total:
+                    self.finished = time.perf_counter()
+            task = self.__Next_task()
+
+    def Progress(self) -> dict:
+        """
+            Returns:
+                dict with total, done, failed, percent, seconds since the start and the stats given to the constructor
+        """
+        with self.__lock:
+            done, failed = self.done, list(self.failed)
+        end = self.finished if self.finished is not None else time.perf_counter()
+        progress = {
+            'total': self.total,
+            'done': done,
+            'failed': failed,
+            'percent': 100.0 * done / self.total if self.total else 100.0,
+            'running': self.started is not None and self.finished is None and not self.__stopped.is_set(),
+            'seconds': end - self.started if self.started is not None else 0.0,
+        }
+        if self.__stats is not None:
+            progress.update(self.__stats())
+        return progress
+
+    def Register_endpoint(self, server, route: str = '/prerender') -> None:
+        """
+            Serves the progress as JSON from a Flask server, like the server of a Dash app
+
+            Args:
+                server (flask.Flask): server, Dash app.server
+                route (str): url of the endpoint
+        """
+        server.add_url_rule(route, 'prerender', lambda: server.response_class(json.dumps(self.Progress()), mimetype='application/json'))
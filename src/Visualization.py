@@ -1,19 +1,38 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from dash import Dash, dcc, html, Input, Output
 from .Data import Data as data_class
+from .FigureCache import FigureCache
+from .Instrumentation import Instrumentation, instrumented
+from .Prerender import Prerenderer
 
 class Visualization:
-    __data = data_class()
+    def __init__(self, data: data_class = None, figure_cache: FigureCache = None):
+        """
+            Args:
+                data (Data): data used by the graphs, by default the Data instance shared by the process, loaded on first use
+                figure_cache (FigureCache): on-disk cache of the dashboard figures, None builds them on every callback
+        """
+        self.__injected_data = data
+        self.figure_cache = figure_cache
+        self.prerenderer = None
+
+    @property
+    def __data(self) -> data_class:
+        if self.__injected_data is None:
+            return data_class.Get_shared()
+        return self.__injected_data
 
     def print_total_asylum_seekers(self):
         """
             Prints the total sum of all asylum seekers
         """
-        print(format(self.__data.asylum_data['count'].sum(), ",d"))
+        print(format(self.__data.Get_year_timeline()['count'].sum(), ",d"))
 
+    @instrumented
     def Country_of_origin(self) -> go.Figure:
         """
             Displays a horizontal bar graphs showing the total number of asylum seekers by country of origin
@@ -21,8 +40,9 @@ class Visualization:
             Return: Plotly figure
         """
         MINIMUM_ASYLUM_SEEKERS = 100_000
-        as_by_country = self.__data.Get_origin_country_total()
-        as_by_country = as_by_country[as_by_country['count'] > MINIMUM_ASYLUM_SEEKERS]
+        as_by_country = self.__data.Get_origin_totals()
+        # only the countries over the minimum are ranked, smallest first so the biggest bar is on top
+        as_by_country = self.__data.Top_k(as_by_country[as_by_country['count'] > MINIMUM_ASYLUM_SEEKERS], 'count').iloc[::-1]
         
         fig = px.bar(
             as_by_country,
@@ -53,6 +73,7 @@ class Visualization:
         fig.update_traces(marker_color='#ad0b0b')
         return fig
 
+    @instrumented
     def Asylum_seekers_timeline(self) -> go.Figure:
         # Create timeline plot
         timeline_data = self.__data.Get_year_timeline()
@@ -77,19 +98,19 @@ class Visualization:
                 layer="below", line_width=0
             )
 
-        # This extra hover text can be separated into a function a check for countries with less than 3 rows
-        
-        # Add hover text
-        extra_hover_text = [
+        # Add hover text, with the three biggest countries of origin of every year
+        origin_year_totals = DATA_CLASS.Get_origin_year_totals()
+        year_totals = origin_year_totals.groupby('year')['count'].sum()
+        extra_hover_text = []
+        for year, countries in DATA_CLASS.Top_k(origin_year_totals, 'count', 3, by='year').groupby('year', sort=False):
+            top_three = ''.join(f"{name}: {count:,}<br>" for name, count in zip(countries['country_of_origin_name'], countries['count']))
+            extra_hover_text.append(
                 f"<b>Year: {year}<br>" +
-                f"Total: {countries['count'].sum():,}<br><br>" +
+                f"Total: {year_totals[year]:,}<br><br>" +
                 f"Top three origin countries:</b><br>" +
-                f"{countries.iloc[0]['country_of_origin_name']}: {countries.iloc[0]['count']:,}<br>" +
-                f"{countries.iloc[1]['country_of_origin_name']}: {countries.iloc[1]['count']:,}<br>" +
-                f"{countries.iloc[2]['country_of_origin_name']}: {countries.iloc[2]['count']:,}<br>" +
-                f"Other: {countries[3:]['count'].sum():,}"
-            for year, countries in self.__data.Get_grouped_by_year_countries_total_origin()
-            ]
+                top_three +
+                f"Other: {year_totals[year] - countries['count'].sum():,}"
+            )
         
         fig.update_traces(
             customdata=extra_hover_text,
@@ -125,6 +146,7 @@ class Visualization:
         fig.update_xaxes(range=[1960, 2025])
         return fig
 
+    @instrumented
     def Destination_countries_graph(self) -> go.Figure:
         # TODO: add better hover text with the principal countries that migrate to that country
         destination_countries = self.__data.Get_destination_countries()
@@ -137,6 +159,7 @@ class Visualization:
         return fig 
 
 
+    @instrumented
     def Biggest_displacement_percentage_graph(self) -> go.Figure:
         destination_countries = self.__data.Get_biggest_population_displacement_df() 
         fig = go.Figure()
@@ -171,6 +194,163 @@ class Visualization:
 
         return fig
 
+    @instrumented
+    def Cached_figure(self, dashboard: str, selection: str, builder):
+        """
+            Gets a dashboard figure from the figure cache, building it when it is not cached or there is no cache
+
+            Args:
+                dashboard (str): name of the dashboard
+                selection (str): selected option, like a country or a period
+                builder (callable): function without arguments that builds the figure
+
+            Return: str with the JSON of the figure, for a graph made with Json_graph
+        """
+        if self.figure_cache is None:
+            return builder().to_json()
+        return self.figure_cache.get_or_create(dashboard, selection, self.__data.Get_data_token(), builder)
+
+    @staticmethod
+    def Json_graph(app: Dash, graph_id: str) -> list:
+        """
+            Creates a graph whose figure is given as JSON text, like the figures of Cached_figure.
+            The callbacks write the text to the store f"{graph_id}-json" and the browser parses it, the server never decodes the cached figures.
+
+            Args:
+                app (Dash): app of the graph
+                graph_id (str): id of the graph
+
+            Return: list with the store and the graph, for the layout
+        """
+        app.clientside_callback(
+            "function(figure) { return figure ? JSON.parse(figure) : window.dash_clientside.no_update; }",
+            Output(graph_id, "figure"),
+            Input(f"{graph_id}-json", "data"))
+        return [dcc.Store(id=f"{graph_id}-json"), dcc.Graph(id=graph_id)]
+
+    def Warm_figure_cache(self) -> int:
+        """
+            Renders the figure of every dropdown option of the dashboards into the figure cache
+
+            Return: number of figures rendered or read
+        """
+        figures = 0
+        for years in self.Crisis_period_options():
+            self.Cached_figure('crisis_period', years, lambda: self.Crisis_period_graph(years))
+            figures += 1
+        # the maps of every country come from one batch computation
+        self.__data.Get_ready_for_plot_all()
+        for country in self.Country_options():
+            self.Cached_figure('country_map', country, lambda: self.Country_destinations_map(country))
+            self.Cached_figure('country_timeline', country, lambda: self.Country_timeline_graph(country))
+            figures += 2
+        return figures
+
+    def Country_prerender_tasks(self) -> list:
+        """
+            Gets the rendering tasks of the country dashboard, the batch computations first and then the countries from the biggest to the smallest.
+            With figure cache the figures are rendered into it, without it only the data of the countries that fit in the query cache is computed.
+
+            Return: list of tuples (name, callable without arguments)
+        """
+        tasks = [('Data.Get_ready_for_plot_all', self.__data.Get_ready_for_plot_all), ('Data.Get_crisis_windows', self.__data.Get_crisis_windows)]
+        countries = self.Country_options()
+        if self.figure_cache is None:
+            # a summary takes three entries of the query cache, with its ready for plot DataFrame and timeline
+            origin_codes = self.__data.Get_origin_codes()
+            for country in countries[:self.__data.query_cache.max_entries // 3]:
+                tasks.append((f"country_summary:{country}", lambda code=origin_codes[country]: self.__data.Get_country_summary(code)))
+            return tasks
+        for country in countries:
+            tasks.append((f"country_map:{country}", lambda country=country: self.Cached_figure('country_map', country, lambda: self.Country_destinations_map(country))))
+            tasks.append((f"country_timeline:{country}", lambda country=country: self.Cached_figure('country_timeline', country, lambda: self.Country_timeline_graph(country))))
+        return tasks
+
+    def Cache_stats(self) -> dict:
+        """
+            Gets the hits and misses of the query cache and of the figure cache, when there is one
+
+            Return: dict
+        """
+        query_cache = self.__data.query_cache
+        stats = {'query_cache': {'hits': query_cache.hits, 'misses': query_cache.misses, 'entries': len(query_cache)}}
+        if self.figure_cache is not None:
+            stats['figure_cache'] = {'hits': self.figure_cache.hits, 'misses': self.figure_cache.misses}
+        return stats
+
+    def Crisis_period_options(self) -> list:
+        """
+            Gets the migration crisis periods of the total timeline as 'start-end' texts
+
+            Return: list of str
+        """
+        migration_crisis = list(self.__data.Peak_finder(self.__data.Get_year_timeline()))
+        return [f"{years['start']}-{years['end']}" for years in migration_crisis]
+
+    @instrumented
+    def Crisis_period_graph(self, years: str) -> go.Figure:
+        """
+            Displays a stacked bar graph with the countries participating in the migration of each year of a crisis period
+
+            Args:
+                years (str): crisis period as 'start-end'
+
+            Return: Plotly figure
+        """
+        years = years.split('-')
+        fig = go.Figure()
+        period_data = self.__data.top_origin_countries_yearly(int(years[0]), int(years[1])).sort_values('count')
+        # share of every bar in the total of its year, computed once for the whole period
+        period_data = period_data.assign(percentage=period_data['count'] / period_data.groupby('year')['count'].transform('sum'))
+        g = period_data.groupby('country_of_origin_name')
+        for country, data in g:
+            custom = [
+                f"<b>{name}</b><br>"
+                f"Year: {year}<br>"
+                f"Total: {count:,}<br>"
+                f"Percentage: {percentage:.2%}"
+                for name, year, count, percentage in zip(data['country_of_origin_name'], data['year'], data['count'], data['percentage'])
+            ]
+            fig.add_trace(
+                go.Bar(
+                    name=country,
+                    x=data['year'],
+                    y=data['count'],
+                    customdata=custom,
+                    hovertemplate="%{customdata}",
+                    marker=dict(line=dict(width=0.5, color='black'))
+                )
+            )
+
+        fig.update_layout(
+            barmode='stack',
+            title={
+                'text': 'Total Asylum Seekers in migration Crisis Period',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'size': 20, 'color': '#333'}
+            },
+            xaxis={
+                'title': {'text': "Years", 'font': {'size': 16, 'color': '#555'}},
+                'showgrid': False,
+                'tickfont': {'size': 12, 'color': '#555'}
+            },
+            yaxis={
+                'title': {'text': 'Asylum Seekers', 'font': {'size': 16, 'color': '#555'}},
+                'showgrid': True,
+                'gridcolor': 'lightgrey',
+                'tickfont': {'size': 12, 'color': '#555'}
+            },
+            legend={
+                'title': {'text': 'Countries', 'font': {'size': 14, 'color': '#555'}},
+                'font': {'size': 12, 'color': '#555'}
+            },
+            plot_bgcolor='white',
+            paper_bgcolor='#f9f9f9',
+            margin=dict(l=50, r=50, t=50, b=50)
+        )
+        return fig
+
     def Migration_crisis_by_period_Dash(self) -> Dash:
         """
             Creates and displays a Dash dashboard of bar graphs showing the years and countries participating in that year migration,
@@ -181,9 +361,11 @@ class Visualization:
         """
 
         app = Dash(__name__)
+        Instrumentation.Register_endpoint(app.server)
 
-        migration_crisis = list(self.__data.Peak_finder(self.__data.asylum_data.groupby('year').agg({'count': 'sum'}).reset_index()))
-        options = [f"{years['start']}-{years['end']}" for years in migration_crisis]
+        options = self.Crisis_period_options()
+        # the periods are fixed, every figure is built with the app and the callback only picks one
+        figures = {years: self.Cached_figure('crisis_period', years, lambda: self.Crisis_period_graph(years)) for years in options}
         app.layout = html.Div([
             html.H2('Migration Crisis Analysis', style={'text-align': 'center', 'color': '#333'}),
             html.H4('Select a migration crisis period:', style={'text-align': 'center', 'font-size': '16px', 'color': '#555'}),
@@ -194,79 +376,153 @@ class Visualization:
                 clearable=False,
                 style={'width': '50%', 'margin': '0 auto'}
             ),
-            dcc.Graph(id="graph"),
+            *self.Json_graph(app, "graph"),
         ], style={'backgroundColor': '#f9f9f9', 'padding': '20px'})
 
         @app.callback(
-            Output("graph", "figure"),
+            Output("graph-json", "data"),
             Input("dropdown", "value"))
         
         def update_bar_chart(years):
-            years = years.split('-')
-            fig = go.Figure()
-            period_data = self.__data.top_origin_countries_yearly(int(years[0]), int(years[1])).sort_values('count')
-            g = period_data.groupby('country_of_origin_name')
-            for country, data in g:
-                custom = [
-                    f"<b>{line['country_of_origin_name']}</b><br>"
-                    f"Year: {line['year']}<br>"
-                    f"Total: {line['count']:,}<br>"
-                    f"Percentage: {(line['count'] / (period_data[period_data['year'] == line['year']]['count'].sum())):.2%}"
-                    for _, line in data.iterrows()
-                ]
-                fig.add_trace(
-                    go.Bar(
-                        name=country,
-                        x=data['year'],
-                        y=data['count'],
-                        customdata=custom,
-                        hovertemplate="%{customdata}",
-                        marker=dict(line=dict(width=0.5, color='black'))
-                    )
-                )
+            return figures[years]
 
-            fig.update_layout(
-                barmode='stack',
-                title={
-                    'text': 'Total Asylum Seekers in migration Crisis Period',
-                    'x': 0.5,
-                    'xanchor': 'center',
-                    'font': {'size': 20, 'color': '#333'}
-                },
-                xaxis={
-                    'title': {'text': "Years", 'font': {'size': 16, 'color': '#555'}},
-                    'showgrid': False,
-                    'tickfont': {'size': 12, 'color': '#555'}
-                },
-                yaxis={
-                    'title': {'text': 'Asylum Seekers', 'font': {'size': 16, 'color': '#555'}},
-                    'showgrid': True,
-                    'gridcolor': 'lightgrey',
-                    'tickfont': {'size': 12, 'color': '#555'}
-                },
-                legend={
-                    'title': {'text': 'Countries', 'font': {'size': 14, 'color': '#555'}},
-                    'font': {'size': 12, 'color': '#555'}
-                },
-                plot_bgcolor='white',
-                paper_bgcolor='#f9f9f9',
-                margin=dict(l=50, r=50, t=50, b=50)
+        return app
+
+    def Country_options(self) -> list:
+        """
+            Gets the names of the countries of origin, from the biggest to the smallest total of asylum seekers
+
+            Return: list of str
+        """
+        countries = self.__data.Get_origin_country_total().sort_values('count', ascending=False)
+        return list(countries['country_of_origin_name'].unique())
+
+    def __Origin_code(self, country: str) -> str:
+        return self.__data.Get_origin_codes()[country]
+
+    @instrumented
+    def Country_destinations_map(self, country: str) -> go.Figure:
+        """
+            Displays an animated choropleth map with the cumulative destinations of the asylum seekers of a country of origin
+
+            Args:
+                country (str): name of the country of origin
+
+            Return: Plotly figure
+        """
+        name = country
+        country = self.__Origin_code(name)
+        final = self.__data.Get_country_summary(country)['ready_for_plot']
+        final_heat = final[final['cumulative_sum'] != 0]
+
+        fig = px.choropleth(final_heat, locations="country", locationmode='ISO-3',
+                            color="cumulative_sum",
+                            color_continuous_scale="Blues",
+                            hover_name="country",
+                            animation_frame="year",
+                            projection="natural earth")
+        country_to_highlight = "USA"
+
+        fig.add_trace(
+            go.Choropleth(
+                locations=[country],
+                z=[1],
+                colorscale=[[0, "red"], [1, "red"]],  
+                showscale=False,
+                hovertemplate="%{location}"
+            )
+        )
+        fig.update_layout(
+            title=f'<b>Destination Countries of Asylum Seekers Originating from {name}<b>',
+            title_x=0.5,
+            title_font=dict(size=18, color='black'),
+                
+            coloraxis_colorbar=dict(
+                title="Asylum seekers"
             )
-            return fig
+        )
+        fig.update_layout(
+            geo={'landcolor' : "#FFFFFF"}
+        )
 
-        return app
+        return fig
 
-    def Specific_country_information_dash(self) -> Dash:
+    @instrumented
+    def Country_timeline_graph(self, country: str) -> go.Figure:
+        """
+            Displays the asylum seekers of a country of origin by year, highlighting its migration crisis
+
+            Args:
+                country (str): name of the country of origin
+
+            Return: Plotly figure
+        """
+        country_iso = self.__Origin_code(country)
+        summary = self.__data.Get_country_summary(country_iso)
+        timeline = summary['timeline']
+        crisis_windows = summary['crisis_windows']
+        trace = go.Scatter(x=timeline['year'], y=timeline['count'], mode='lines+markers',
+        line=dict(color='#1f77b4', width=2),
+        marker=dict(size=6, color='#ff7f0e'),
+        name='Total Asylum Seekers')
+
+        fig = go.Figure(trace)
+
+        for peak in crisis_windows[['start', 'end']].to_dict('records'):
+            fig.add_shape(type="rect",
+                        x0=peak['start'], y0=0, x1=peak['end'], y1=timeline['count'].max(),
+                        fillcolor="tomato", opacity=0.5,
+                        layer="below", line_width=0)
+
+        fig.update_layout(
+            title=f'<b>Total Asylum Seekers from {country} by Year (Highlighted Migration crisis)<b>',
+            xaxis={'title': {'text': "Years"}, 'showgrid':False},
+            yaxis={'title': {'text': 'Asylum Seekers'}, 'rangemode': 'tozero', 'showgrid':False}
+        )
+        fig.update_layout(
+            title_x=0.5,
+            title_font=dict(size=18, color='black'),
+            xaxis=dict(
+                title="<b>Year</b>",
+                showgrid=True,
+                gridcolor='lightgrey',
+                zeroline=False,
+            ),
+            yaxis=dict(
+                title="<b>Asylum Seekers</b>",
+                showgrid=True,
+                gridcolor='lightgrey',
+                rangemode='tozero'
+            ),
+            plot_bgcolor='white',
+            hoverlabel=dict(
+                bgcolor="white",
+                font_size=12,
+                font_family="Arial"
+            ),
+        )
+
+        return fig
+
+    def Specific_country_information_dash(self, prerender_workers: int = 0) -> Dash:
         """
             This function creates a Dash app that displays a choropleth map and a line chart of asylum seekers by country.
+            With prerender_workers the figures of every country are pre-rendered in the background, the progress is served at /prerender.
+
+            Args:
+                prerender_workers (int): threads pre-rendering the countries, for a server with a figure cache, 0 renders them only when selected
 
             Returns: Dash app
         """
         app2 = Dash(__name__)
+        Instrumentation.Register_endpoint(app2.server)
+        if prerender_workers > 0:
+            if self.prerenderer is not None:
+                self.prerenderer.stop()
+            self.prerenderer = Prerenderer(self.Country_prerender_tasks(), prerender_workers, self.Cache_stats).start()
+            self.prerenderer.Register_endpoint(app2.server)
 
-        countries = self.__data.Get_origin_country_total().sort_values('count', ascending=False)
-        options = countries['country_of_origin_name'].unique()
-        country_names = self.__data.asylum_data[['country_of_origin_abbr', 'country_of_origin_name']]
+        options = self.Country_options()
 
         app2.layout = html.Div([
             html.H2('Countries', style={'text-align': "center"}),
@@ -277,106 +533,29 @@ class Visualization:
                 value=options[0],
                 clearable=False,
             ),
-            dcc.Graph(id="line"),
-            dcc.Graph(id="graph"),
+            *self.Json_graph(app2, "line"),
+            *self.Json_graph(app2, "graph"),
             
         ], style={'backgroundColor':'white'})
 
         @app2.callback(
-            Output("graph", "figure"),
+            Output("graph-json", "data"),
             Input("dropdown", "value"))
 
         def update_bar_chart(country):
-            name = country
-            country = country_names[country_names['country_of_origin_name'] == country]['country_of_origin_abbr'].values[0]
-            final = self.__data.Get_ready_for_plot_df(country)
-            final_heat = final[final['cumulative_sum'] != 0]
-
-            fig = px.choropleth(final_heat, locations="country", locationmode='ISO-3',
-                                color="cumulative_sum",
-                                color_continuous_scale="Blues",
-                                hover_name="country",
-                                animation_frame="year",
-                                projection="natural earth")
-            country_to_highlight = "USA"
-
-            fig.add_trace(
-                go.Choropleth(
-                    locations=[country],
-                    z=[1],
-                    colorscale=[[0, "red"], [1, "red"]],  
-                    showscale=False,
-                    hovertemplate="%{location}"
-                )
-            )
-            fig.update_layout(
-                title=f'<b>Destination Countries of Asylum Seekers Originating from {name}<b>',
-                title_x=0.5,
-                title_font=dict(size=18, color='black'),
-                
-                coloraxis_colorbar=dict(
-                    title="Asylum seekers"
-                )
-            )
-            fig.update_layout(
-                geo={'landcolor' : "#FFFFFF"}
-            )
-
-            return fig
+            return self.Cached_figure('country_map', country, lambda: self.Country_destinations_map(country))
 
         @app2.callback(
-            Output("line", "figure"),
+            Output("line-json", "data"),
             Input("dropdown", "value"))
         ## TODO: test leaving the max and min consistent
         def update_line(country):
-            country_iso = country_names[country_names['country_of_origin_name'] == country]['country_of_origin_abbr'].values[0]
-            timeline = self.__data.Get_total_country_migration_df(country_iso)
-            trace = go.Scatter(x=timeline['year'], y=timeline['count'], mode='lines+markers',
-            line=dict(color='#1f77b4', width=2),
-            marker=dict(size=6, color='#ff7f0e'),
-            name='Total Asylum Seekers')
-
-            fig = go.Figure(trace)
-
-            for peak in self.__data.Peak_finder(timeline):
-                fig.add_shape(type="rect",
-                            x0=peak['start'], y0=0, x1=peak['end'], y1=timeline['count'].max(),
-                            fillcolor="tomato", opacity=0.5,
-                            layer="below", line_width=0)
-
-            fig.update_layout(
-                title=f'<b>Total Asylum Seekers from {country} by Year (Highlighted Migration crisis)<b>',
-                xaxis={'title': {'text': "Years"}, 'showgrid':False},
-                yaxis={'title': {'text': 'Asylum Seekers'}, 'rangemode': 'tozero', 'showgrid':False}
-            )
-            fig.update_layout(
-                title_x=0.5,
-                title_font=dict(size=18, color='black'),
-                xaxis=dict(
-                    title="<b>Year</b>",
-                    showgrid=True,
-                    gridcolor='lightgrey',
-                    zeroline=False,
-                ),
-                yaxis=dict(
-                    title="<b>Asylum Seekers</b>",
-                    showgrid=True,
-                    gridcolor='lightgrey',
-                    rangemode='tozero'
-                ),
-                plot_bgcolor='white',
-                hoverlabel=dict(
-                    bgcolor="white",
-                    font_size=12,
-                    font_family="Arial"
-                ),
-            )
-
-            return fig
+            return self.Cached_figure('country_timeline', country, lambda: self.Country_timeline_graph(country))
 
 
         return app2
     
+
     # Dual choroplet map
     @staticmethod
     def create_slider(dates):
@@ -449,36 +628,123 @@ class Visualization:
         )
         return fig
 
+    @staticmethod
+    def Year_array(data: pd.DataFrame, column: str, locations: pd.Index, dates: list, fill, dtype) -> np.ndarray:
+        """
+            Places the values of a column in a dates x locations array, in one pass over the data
+
+            Args:
+                data (pandas.DataFrame): DataFrame with country, year and column
+                column (str): column with the values
+                locations (pandas.Index): country codes in the order of the trace
+                dates (list): years of the frames
+                fill: value of the countries without data in a year
+                dtype: type of the array
+
+            Returns:
+                numpy.ndarray with a row per date and a column per location
+        """
+        date_codes = pd.Index(dates).get_indexer(data['year'])
+        location_codes = locations.get_indexer(data['country'])
+        rows = (date_codes >= 0) & (location_codes >= 0)
+        values = np.full((len(dates), len(locations)), fill, dtype=dtype)
+        values[date_codes[rows], location_codes[rows]] = data[column].to_numpy()[rows]
+        return values
+
+    def Compact_payload(self, data: pd.DataFrame, analisis_type: str, dates: list) -> dict:
+        """
+            Splits a map data into what is the same in every frame, the countries and their names, and what changes, the sums and top partners.
+            Sums are float32 when they are exact in float32, missing values are NaN so the country is not drawn that year.
+
+            Args:
+                data (pandas.DataFrame): map data without hover text, see Data.Destination_or_origin_by_year
+                analisis_type (str): 'origin' or 'asylum'
+                dates (list): years of the frames
+
+            Returns:
+                dict with locations, names, hovertemplate, z and partners, z and partners with a row per date
+        """
+        locations = pd.Index(data['country'].unique())
+        partners = self.__data.Get_top_partners_index(analisis_type)['top_partners']
+        data = data.assign(partners=partners.reindex(pd.MultiIndex.from_arrays([data['country'], data['year']])).fillna('').to_numpy())
+        dtype = np.float32 if data['cumulative_sum'].max() < 2 ** 24 else np.float64
+        TOTAL_DESCRIPTION, result_countries = self.__data.HOVER_TITLES[analisis_type]
+        return {
+            'locations': locations,
+            'names': [self.__data.abbr_dict[country] for country in locations],
+            # same text as Data.Add_hover_text
+            'hovertemplate': f"<b>%{{text}}<br>{TOTAL_DESCRIPTION} %{{z:,}}<br><br>Top {result_countries} countries:</b><br>%{{customdata}}",
+            'z': self.Year_array(data, 'cumulative_sum', locations, dates, np.nan, dtype),
+            'partners': self.Year_array(data, 'partners', locations, dates, '', object)
+        }
+
+    def Create_compact_plots(self, payload: dict, color_scale: str, showscale: bool = True) -> go.Choropleth:
+        """
+            Creates the trace of a map with compact frames, with the invariant properties and the values of the first frame
+        """
+        trace = self.Create_plots(pd.DataFrame({'country': payload['locations'], 'cumulative_sum': payload['z'][0], 'hover_text': payload['partners'][0]}),
+                                  color_scale, showscale)
+        trace.update(text=payload['names'], hovertemplate=payload['hovertemplate'])
+        return trace
+
     def Create_Frames(self, origin_data: pd.DataFrame, destination_data: pd.DataFrame) -> list:
-        frames = []
         dates = sorted(set(origin_data['year'].unique()))
+        origin_by_year = dict(tuple(origin_data.groupby('year')))
+        destination_by_year = dict(tuple(destination_data.groupby('year')))
+        frames = []
         for date in dates:
-            origin = origin_data[origin_data['year'] == date]
-            destination = destination_data[destination_data['year'] == date]
-
             frames.append(go.Frame(
                 data=[
-                    self.Create_plots(origin, "Reds", showscale=False),
-                    self.Create_plots(destination, "Blues", showscale=False)
+                    self.Create_plots(origin_by_year[date], "Reds", showscale=False),
+                    self.Create_plots(destination_by_year.get(date, destination_data.iloc[0:0]), "Blues", showscale=False)
                 ],
                 name=str(date)
             ))
         return frames
 
+    def Create_compact_frames(self, origin_payload: dict, destination_payload: dict, dates: list) -> list:
+        """
+            Creates frames that only carry the sums and top partners of each year, the rest stays in the traces of Create_compact_plots
+        """
+        return [
+            go.Frame(
+                data=[go.Choropleth(z=origin_payload['z'][index], customdata=origin_payload['partners'][index]),
+                      go.Choropleth(z=destination_payload['z'][index], customdata=destination_payload['partners'][index])],
+                traces=[0, 1],
+                name=str(date)
+            )
+            for index, date in enumerate(dates)
+        ]
+
+    def Get_origin_and_destination_graphs(self, compact_payload: bool = True):
+        """
+            Displays the animated maps of the cumulative countries of origin and of destination
+
+            Args:
+                compact_payload (bool): builds frames with only the sums and top partners of each year, see Compact_payload
 
-    def Get_origin_and_destination_graphs(self):
-        origin_df = self.__data.Destination_or_origin_by_year('origin')
-        destination_df = self.__data.Destination_or_origin_by_year('asylum')
+            Return: Plotly figure
+        """
+        # the compact frames build the hover texts from the top partners, the texts of every row are not formatted
+        origin_df = self.__data.Destination_or_origin_by_year('origin', hover_text=not compact_payload)
+        destination_df = self.__data.Destination_or_origin_by_year('asylum', hover_text=not compact_payload)
 
         fig = make_subplots(rows=1, cols=2, subplot_titles=('<b>Countries of origin</b>', '<b>Countries of destination</b>'),
                             specs=[[{'type': 'choropleth'}, {'type': 'choropleth'}]], horizontal_spacing=0.01)
 
         # Initial traces
         initial_year = origin_df['year'].min()
-        fig.add_trace(self.Create_plots(origin_df[origin_df['year'] == initial_year], "Reds", showscale=True), row=1, col=1)
-        fig.add_trace(self.Create_plots(destination_df[destination_df['year'] == initial_year], "Blues", showscale=True), row=1, col=2)
-
-        frames = self.Create_Frames(origin_df, destination_df)
+        if compact_payload:
+            dates = sorted(set(origin_df['year'].unique()))
+            origin_payload = self.Compact_payload(origin_df, 'origin', dates)
+            destination_payload = self.Compact_payload(destination_df, 'asylum', dates)
+            fig.add_trace(self.Create_compact_plots(origin_payload, "Reds", showscale=True), row=1, col=1)
+            fig.add_trace(self.Create_compact_plots(destination_payload, "Blues", showscale=True), row=1, col=2)
+            frames = self.Create_compact_frames(origin_payload, destination_payload, dates)
+        else:
+            fig.add_trace(self.Create_plots(origin_df[origin_df['year'] == initial_year], "Reds", showscale=True), row=1, col=1)
+            fig.add_trace(self.Create_plots(destination_df[destination_df['year'] == initial_year], "Blues", showscale=True), row=1, col=2)
+            frames = self.Create_Frames(origin_df, destination_df)
         fig.frames = frames
 
         slider = self.create_slider(sorted(set(origin_df['year'].unique().astype(str))))
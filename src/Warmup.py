@@ -0,0 +1,43 @@
+import argparse
+import sys
+import time
+from .Data import Data
+from .FigureCache import FigureCache
+from .Instrumentation import Instrumentation
+from .Visualization import Visualization
+
+
+def main(argv: list = None) -> int:
+    """
+        Pre-renders every dashboard dropdown option into the figure cache.
+        Usage: python -m src.Warmup [--folder FOLDER] [--clear] [--years START END] [--instrumentation FILE] [--memmap FOLDER]
+    """
+    parser = argparse.ArgumentParser(description='Pre-renders every dashboard figure into the figure cache')
+    parser.add_argument('--folder', default=FigureCache.DEFAULT_FOLDER, help='folder of the cached figures')
+    parser.add_argument('--clear', action='store_true', help='removes the cached figures before rendering')
+    parser.add_argument('--years', type=int, nargs=2, default=None, metavar=('START', 'END'), help='renders the dashboards of these years only')
+    parser.add_argument('--instrumentation', default=None, help='enables the instrumentation and writes its spans to this JSON file')
+    parser.add_argument('--memmap', default=None, help='also writes the data memory mapped to this folder, for the workers started with ASYLUM_MEMMAP_FOLDER')
+    args = parser.parse_args(argv)
+    if args.instrumentation:
+        Instrumentation.Enable()
+
+    figure_cache = FigureCache(args.folder)
+    if args.clear:
+        figure_cache.clear()
+
+    start = time.perf_counter()
+    data = Data(years=range(args.years[0], args.years[1] + 1)) if args.years else None
+    if args.memmap:
+        (data or Data.Get_shared()).Export_memmap(args.memmap)
+        # the figures are rendered from the data the workers will attach to
+        data = Data(memmap_folder=args.memmap)
+    figures = Visualization(data, figure_cache=figure_cache).Warm_figure_cache()
+    print(f"{figures} figures ready ({figure_cache.misses} rendered) in {time.perf_counter() - start:.1f}s")
+    if args.instrumentation:
+        Instrumentation.Export_json(args.instrumentation)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
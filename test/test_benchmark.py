@@ -0,0 +1,26 @@
+from timing.Benchmark import Compare
+from timing.SyntheticData import Generate_asylum_data, Generate_population_data
+
+
+def test_Generate_asylum_data():
+    data = Generate_asylum_data(5_000, countries=50, seed=1)
+    expected_columns = ['country_of_origin_abbr', 'country_of_origin_name', 'country_of_asylum_abbr', 'country_of_asylum_name',
+                        'region_of_asylum', 'category', 'year', 'count']
+
+    assert list(data.columns) == expected_columns
+    assert len(data) == 5_000
+    assert (data['country_of_origin_abbr'] != data['country_of_asylum_abbr']).all()
+    assert (data['count'] > 0).all()
+    assert data.equals(Generate_asylum_data(5_000, countries=50, seed=1))
+
+    population = Generate_population_data(countries=50, seed=1)
+    assert set(data['country_of_origin_abbr']) <= set(population['Country Code'])
+
+
+def test_Compare():
+    baseline = {'1x:Data.Get_year_timeline': {'seconds': 1.0, 'peak_bytes': 100}}
+
+    assert Compare({'1x:Data.Get_year_timeline': {'seconds': 1.2, 'peak_bytes': 100}}, baseline, 1.5) == []
+    assert len(Compare({'1x:Data.Get_year_timeline': {'seconds': 2.0, 'peak_bytes': 300}}, baseline, 1.5)) == 2
+    # cases without baseline are not compared
+    assert Compare({'10x:Data.Get_year_timeline': {'seconds': 9.0, 'peak_bytes': 900}}, baseline, 1.5) == []
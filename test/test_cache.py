@@ -0,0 +1,32 @@
+from src.Cache import LRUCache
+import pandas as pd
+
+
+def test_LRUCache_entries():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    # 'b' is the least recently used
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+def test_LRUCache_memory():
+    df = pd.DataFrame({'count': range(1_000)})
+    size = LRUCache.size_of(df)
+    cache = LRUCache(max_entries=10, max_bytes=int(size * 2.5))
+    for key in range(4):
+        cache.put(key, df)
+
+    assert len(cache) == 2
+    assert cache.current_bytes == size * 2
+    assert cache.get(0) == (False, None)
+
+    # values bigger than the limit are not stored
+    cache.put('big', pd.concat([df] * 3))
+    assert cache.get('big') == (False, None)
+    assert len(cache) == 2
@@ -0,0 +1,88 @@
+import os
+import pytest
+from src.Cleaner import Cleaner
+from src.Data import Data
+import pandas as pd
+
+
+def test_Output_table(tmp_path):
+    pytest.importorskip('pyarrow')
+    data = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    file_path = str(tmp_path / 'Asylum_data')
+
+    Cleaner.Output_table(data, file_path, Cleaner.Asylum_schema())
+
+    # feather file first (missing text comes back as None), csv file when there is no feather file
+    pd.testing.assert_frame_equal(Data.Read_clean_table(file_path).fillna(''), data.fillna(''))
+    os.remove(f'{file_path}.feather')
+    pd.testing.assert_frame_equal(Data.Read_clean_table(file_path), data)
+
+
+def test_streaming_asylum_output(tmp_path):
+    clean = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    raw = clean.rename(columns={
+        'country_of_origin_abbr': 'OriginISO', 'country_of_origin_name': 'OriginName', 'country_of_asylum_abbr': 'AsylumISO',
+        'country_of_asylum_name': 'AsylumName', 'region_of_asylum': 'AsylumRegion', 'category': 'PT', 'year': 'Year', 'count': 'Count'
+    })
+    raw['PT'] = raw['PT'].replace({'Refugee': 'REF', 'Asylum-seekers': 'ASY'})
+    raw['origin'] = raw['OriginName']
+    raw['asylum'] = raw['AsylumName']
+    raw.loc[0, 'OriginISO'] = 'TIB'
+    raw.loc[1, 'AsylumISO'] = 'NA'
+    workbook_path = str(tmp_path / 'asylum.xlsx')
+    raw.to_excel(workbook_path, sheet_name='DATA', index=False)
+
+    outputs = {}
+    for mode, chunk_size in [('full', None), ('streamed', 500)]:
+        folder = tmp_path / mode
+        folder.mkdir()
+        cleaner = Cleaner(f"{folder}{os.sep}")
+        cleaner.Output_asylum_seekers_clean_data(workbook_path, chunk_size)
+        outputs[mode] = folder
+
+    for name in ['Asylum_data', 'Views\\by_origin_asylum_year', 'Views\\by_year']:
+        full = Data.Read_clean_table(f"{outputs['full']}{os.sep}{name}")
+        streamed = Data.Read_clean_table(f"{outputs['streamed']}{os.sep}{name}")
+        pd.testing.assert_frame_equal(streamed, full)
+    assert len(Data.Read_clean_table(f"{outputs['streamed']}{os.sep}Asylum_data")) == len(clean) - 1
+
+
+def test_Update_asylum_seekers_clean_data(tmp_path):
+    raw = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv').rename(columns={
+        'country_of_origin_abbr': 'OriginISO', 'country_of_origin_name': 'OriginName', 'country_of_asylum_abbr': 'AsylumISO',
+        'country_of_asylum_name': 'AsylumName', 'region_of_asylum': 'AsylumRegion', 'category': 'PT', 'year': 'Year', 'count': 'Count'
+    })
+    raw['origin'] = raw['OriginName']
+    raw['asylum'] = raw['AsylumName']
+    source_path = str(tmp_path / 'asylum.csv')
+    raw.to_csv(source_path, index=False)
+    cleaner = Cleaner(f"{tmp_path}{os.sep}")
+
+    years = sorted(raw['Year'].unique())
+    assert cleaner.Update_asylum_seekers_clean_data(source_path, 500) == years
+    # same source, nothing to do
+    assert cleaner.Update_asylum_seekers_clean_data(source_path, 500) == []
+
+    # a new year and a correction of an old one
+    new_year = raw[raw['Year'] == years[-1]].assign(Year=years[-1] + 1)
+    raw.loc[raw['Year'] == years[0], 'Count'] += 1
+    raw = pd.concat([raw, new_year], ignore_index=True)
+    raw.to_csv(source_path, index=False)
+    assert cleaner.Update_asylum_seekers_clean_data(source_path, 500) == [years[0], years[-1] + 1]
+
+    expected = Cleaner.Clean_asylum_chunk(raw).reset_index(drop=True)
+    pd.testing.assert_frame_equal(Data.Read_clean_table(f"{tmp_path}{os.sep}Asylum_data").fillna(''), expected.fillna(''))
+    expected_view = Data.Build_aggregate_view(expected, 'by_origin')
+    pd.testing.assert_frame_equal(Data.Read_clean_table(f"{tmp_path}{os.sep}Views\\by_origin").fillna(''), expected_view.fillna(''))
+
+    # rows without year and rows out of year order give the same data as the full clean
+    raw = pd.concat([raw.sample(frac=1, random_state=0), raw.head(3).assign(Year=None)], ignore_index=True)
+    raw.to_csv(source_path, index=False)
+    assert cleaner.Update_asylum_seekers_clean_data(source_path, 500)[0] is None
+    full_folder = tmp_path / 'full'
+    full_folder.mkdir()
+    full_cleaner = Cleaner(f"{full_folder}{os.sep}")
+    full_cleaner.Output_asylum_seekers_clean_data(source_path, 500)
+    for table in ['Asylum_data'] + [f"Views\\{name}" for name in Data.AGGREGATE_VIEWS]:
+        pd.testing.assert_frame_equal(Data.Read_clean_table(f"{tmp_path}{os.sep}{table}").fillna(''),
+                                      Data.Read_clean_table(f"{full_folder}{os.sep}{table}").fillna(''))
@@ -47,6 +47,17 @@ def test_top_origin_countries_yearly():
     expected_result = pd.read_csv('test\\utils\\results_for_top_origin_countries_yearly.csv')
     pd.testing.assert_frame_equal(result, expected_result)
 
+def test_top_origin_countries_yearly_participation():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class = Data()
+    data_class.asylum_data = mock
+    result = data_class.top_origin_countries_yearly(1975, 1980, minimum_participation=0)
+
+    assert 'Other' not in result['country_of_origin_name'].values
+    assert result['count'].sum() == mock[mock['year'].between(1975, 1980)]['count'].sum()
+    # the source data is left untouched
+    pd.testing.assert_frame_equal(data_class.asylum_data, pd.read_csv('test\\utils\\mock_data_for_top_countries.csv'))
+
 # TODO: make test\\utils\\mock_data_population.csv smaller and change the desire outputs
 def test_Country_population_data():
     mock = pd.read_csv('test\\utils\\mock_data_population.csv', index_col=0)
@@ -87,10 +98,26 @@ def test_Get_destination_by_year():
 
     result = data_class.Get_destination_by_year('KEN')
 
-    expected_result = pd.DataFrame({'year': ['1996'], 'country_of_asylum_abbr': ['GBR'], 'count': ['1170'], 'merge_column': ['GBR1996']})
+    expected_result = pd.DataFrame({'year': ['1996'], 'country_of_asylum_abbr': ['GBR'], 'count': ['1170']})
     
     pd.testing.assert_frame_equal(result, expected_result)
 
+def test_Build_country_year_panel():
+    mock_data = pd.DataFrame({
+        'country_of_asylum_abbr': ['GBR', 'CHE', 'GBR', 'GBR'],
+        'year': [1996, 1989, 1989, 1996],
+        'count': [1170, 7, 10, 30]
+    })
+
+    result = Data.Build_country_year_panel(mock_data, 'country_of_asylum_abbr')
+
+    expected_result = pd.DataFrame([{'country': 'GBR', 'year': 1989, 'count': 10, 'cumulative_sum': 10},
+                                    {'country': 'GBR', 'year': 1996, 'count': 1200, 'cumulative_sum': 1210},
+                                    {'country': 'CHE', 'year': 1989, 'count': 7, 'cumulative_sum': 7},
+                                    {'country': 'CHE', 'year': 1996, 'count': 0, 'cumulative_sum': 7}])
+
+    pd.testing.assert_frame_equal(result, expected_result)
+
 def test_Get_countries_and_years_df():
     mock_data = Get_mock_data()
 
@@ -127,3 +154,368 @@ def test_Get_ready_for_plot_df():
 
     pd.testing.assert_frame_equal(result, expected_result)
 
+
+def Get_mock_partner_data() -> pd.DataFrame:
+    return pd.DataFrame([
+        {'country_of_origin_abbr' : 'KEN', 'country_of_origin_name' : 'Kenya', 'country_of_asylum_abbr' : 'GBR',
+        'country_of_asylum_name' : 'United Kingdom', 'region_of_asylum' : 'Europe', 'category': 'Asylum-seekers', 'year': 1990, 'count': 100},
+
+        {'country_of_origin_abbr' : 'KEN', 'country_of_origin_name' : 'Kenya', 'country_of_asylum_abbr' : 'CHE',
+        'country_of_asylum_name' : 'Switzerland', 'region_of_asylum' : 'Europe', 'category': 'Refugee', 'year': 1991, 'count': 300},
+
+        {'country_of_origin_abbr' : 'KEN', 'country_of_origin_name' : 'Kenya', 'country_of_asylum_abbr' : 'GBR',
+        'country_of_asylum_name' : 'United Kingdom', 'region_of_asylum' : 'Europe', 'category': 'Refugee', 'year': 1992, 'count': 1250},
+
+        {'country_of_origin_abbr' : 'TGO', 'country_of_origin_name' : 'Togo', 'country_of_asylum_abbr' : 'CHE',
+        'country_of_asylum_name' : 'Switzerland', 'region_of_asylum' : 'Europe', 'category': 'Asylum-seekers', 'year': 1991, 'count': 7}
+    ])
+
+def test_Get_top_partners_index():
+    data_class = Data()
+    data_class.asylum_data = Get_mock_partner_data()
+
+    result = data_class.Get_top_partners_index('origin').loc['KEN', 'top_partners']
+
+    assert result.to_dict() == {
+        1990: 'United Kingdom: 100<br>',
+        1991: 'Switzerland: 300<br>United Kingdom: 100<br>',
+        1992: 'United Kingdom: 1,350<br>Switzerland: 300<br>'
+    }
+
+def test_Add_hover_text():
+    data_class = Data()
+    data_class.asylum_data = Get_mock_partner_data()
+    data_class.abbr_dict.update({'KEN': 'Kenya', 'TGO': 'Togo', 'GBR': 'United Kingdom', 'CHE': 'Switzerland'})
+
+    for analisis_type, COLUMN_NAME, TOTAL_DESCRIPTION, result_countries in [
+            ('origin', 'country_of_asylum_name', 'Displaced population:', 'destination'),
+            ('asylum', 'country_of_origin_name', 'Asylum seekers received:', 'origin')]:
+        df = data_class.Destination_or_origin_by_year(analisis_type)
+        # the lookup has to match the row by row text creation
+        for row in df.drop(columns=['hover_text']).itertuples():
+            specific_type_df = data_class.inverse_df_result(row, COLUMN_NAME, analisis_type, row.country)
+            expected_result = data_class.typer(row.country, TOTAL_DESCRIPTION, result_countries, analisis_type, COLUMN_NAME, specific_type_df, row)
+            assert df.loc[row.Index, 'hover_text'] == expected_result
+
+def test_Find_crisis_windows():
+    # same series as test_Peak_finder, one per country and unsorted
+    mock = pd.DataFrame({
+        'country': ['AAA', 'BBB', 'AAA', 'CCC', 'AAA', 'BBB', 'CCC', 'CCC', 'BBB', 'CCC'],
+        'year': [1992, 1993, 1991, 1996, 1990, 1995, 1997, 1998, 1994, 1999],
+        'count': [60_000, 60_000, 150_000, 70_000, 5_000, 70_000, 110_000, 110_000, 65_000, 90_000]
+    })
+
+    result = Data.Find_crisis_windows(mock, 'country')
+
+    expected_result = pd.DataFrame({'country': ['AAA', 'CCC'], 'start': [1990, 1996], 'end': [1992, 1999]})
+    pd.testing.assert_frame_equal(result, expected_result)
+
+def test_Find_crisis_windows_open_window():
+    # a window still open when its series ends is dropped, not closed by the next series
+    mock = pd.DataFrame({
+        'country': ['AAA', 'AAA', 'BBB', 'BBB'],
+        'year': [1990, 1991, 1990, 1991],
+        'count': [5_000, 150_000, 1_000, 500]
+    })
+
+    result = Data.Find_crisis_windows(mock, 'country')
+
+    assert result.empty
+
+def test_Get_population_long():
+    mock = pd.read_csv('test\\utils\\mock_data_population.csv', index_col=0)
+    data_class = Data()
+    data_class.population_data = mock
+
+    result = data_class.Get_population_long()
+
+    assert list(result.columns) == ['Country Code', 'year', 'population']
+    assert result['population'].notna().all()
+    assert result[(result['Country Code'] == 'AFG') & (result['year'] == 1972)]['population'].iloc[0] == 11853696.0
+
+def test_get_country_population_df_matches_per_country():
+    mock = pd.read_csv('test\\utils\\mock_data_population.csv', index_col=0)
+    data_class = Data()
+    data_class.population_data = mock
+    data_class.asylum_data = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+
+    result = data_class.Get_country_population_df()
+
+    expected_result = pd.concat([
+        data_class.Country_population_data(country)
+        for country in data_class.asylum_data['country_of_origin_abbr'].unique()
+        if country in mock['Country Code'].values
+    ])
+    pd.testing.assert_frame_equal(result, expected_result)
+
+def test_compact_schema_results():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    normal, compact = Data(), Data()
+    normal.asylum_data = mock
+    compact.asylum_data = Data.Compact_asylum_data(mock)
+    for data_class in [normal, compact]:
+        data_class.population_data = pd.read_csv('test\\utils\\mock_data_population.csv', index_col=0)
+        data_class.abbr_dict.update(dict(zip(mock['country_of_asylum_abbr'], mock['country_of_asylum_name'])))
+        data_class.abbr_dict.update(dict(zip(mock['country_of_origin_abbr'], mock['country_of_origin_name'])))
+
+    assert compact.asylum_data['year'].dtype == 'int16'
+    assert compact.asylum_data['count'].dtype == 'int32'
+    assert compact.asylum_data['country_of_origin_abbr'].dtype == 'category'
+
+    def assert_same(method, *args):
+        pd.testing.assert_frame_equal(getattr(compact, method)(*args), getattr(normal, method)(*args),
+                                      check_dtype=False, check_categorical=False, check_index_type=False)
+
+    assert_same('top_origin_countries_yearly', 1975, 1980)
+    assert_same('Country_population_data', 'AFG')
+    assert_same('Get_country_population_df')
+    assert_same('Get_destination_by_year', 'AFG')
+    assert_same('Get_ready_for_plot_df', 'AFG')
+    assert_same('Destination_or_origin_by_year', 'origin')
+    assert_same('Destination_or_origin_by_year', 'asylum')
+    assert_same('Get_total_country_migration_df', 'AFG')
+    assert_same('Get_origin_country_total')
+    assert_same('Get_year_timeline')
+    assert_same('Get_destination_countries')
+    assert_same('Get_biggest_population_displacement_df')
+    assert_same('Get_crisis_windows')
+    pd.testing.assert_frame_equal(pd.concat([group for _, group in compact.Get_grouped_by_year_countries_total_origin()]),
+                                  pd.concat([group for _, group in normal.Get_grouped_by_year_countries_total_origin()]),
+                                  check_dtype=False, check_categorical=False)
+
+def test_compact_schema_missing_values():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    # the rows without year are kept by Cleaner in their own partition
+    mock = pd.concat([mock, mock.head(2).assign(year=None)], ignore_index=True)
+
+    compact = Data.Compact_asylum_data(mock)
+
+    assert compact['year'].dtype == 'Int16'
+    assert compact['count'].dtype == 'int32'
+    assert compact['year'].isna().sum() == 2
+    pd.testing.assert_frame_equal(compact, mock, check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(Data.Build_aggregate_view(compact, 'by_year'), Data.Build_aggregate_view(mock, 'by_year'), check_dtype=False)
+
+def test_Get_shared():
+    data_class = Data()
+    Data.Set_shared(data_class)
+    try:
+        assert Data.Get_shared() is data_class
+        assert Data.Get_shared() is Data.Get_shared()
+    finally:
+        Data.Set_shared(None)
+
+def test_aggregate_view_getters():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class = Data()
+    data_class.asylum_data = mock
+
+    by_origin_asylum_year = data_class.Get_aggregate_view('by_origin_asylum_year')
+    assert by_origin_asylum_year['count'].sum() == mock['count'].sum()
+
+    # same results as grouping the full table
+    pd.testing.assert_frame_equal(data_class.Get_year_timeline(), mock.groupby('year').agg({'count': 'sum'}).reset_index())
+    pd.testing.assert_frame_equal(data_class.Get_origin_country_total(),
+                                  mock.groupby('country_of_origin_name').agg({'count': 'sum'}).sort_values('count', ascending=True).reset_index())
+    pd.testing.assert_frame_equal(data_class.Get_total_country_migration_df('AFG'),
+                                  mock[mock['country_of_origin_abbr'] == 'AFG'].groupby('year').agg({'count' : 'sum'}).reset_index())
+    assert data_class.Get_destination_countries()['count'].tolist() == mock.groupby("country_of_asylum_abbr").agg({"count":'sum'})['count'].sort_values(ascending=False).tolist()
+
+def test_stale_views(tmp_path):
+    from src.Cleaner import Cleaner
+    import os
+    folder = f"{tmp_path}{os.sep}"
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    pd.read_csv('test\\utils\\mock_data_population.csv').to_csv(f"{folder}Population_data.csv", index=False)
+    cleaner = Cleaner(folder)
+    Cleaner.Output_table(mock, f"{folder}Asylum_data")
+    # views that are not the sums of Asylum_data, read only while they are marked as built from its files
+    cleaner.Output_views({name: Data.Build_aggregate_view(mock.assign(count=mock['count'] * 2), name) for name in Data.AGGREGATE_VIEWS})
+    assert Data(data_folder=folder).Get_year_timeline()['count'].sum() == 2 * mock['count'].sum()
+
+    # Asylum_data replaced without its views
+    Cleaner.Output_table(mock, f"{folder}Asylum_data")
+    assert not Data.Views_match(folder)
+    assert Data(data_folder=folder).Get_year_timeline()['count'].sum() == mock['count'].sum()
+    os.remove(f"{folder}Views_manifest.json")
+    assert Data(data_folder=folder).Get_year_timeline()['count'].sum() == mock['count'].sum()
+
+def test_query_cache():
+    data_class = Data(cache_size=2)
+    data_class.asylum_data = Get_mock_partner_data()
+
+    result = data_class.Get_total_country_migration_df('KEN')
+    assert data_class.Get_total_country_migration_df('KEN') is result
+
+    # new data, new results
+    data_class.asylum_data = Get_mock_partner_data().iloc[:1]
+    assert data_class.Get_total_country_migration_df('KEN')['count'].tolist() == [100]
+    assert len(data_class.query_cache) == 2
+
+def test_years_pushdown(tmp_path):
+    from src.Cleaner import Cleaner
+    import os
+    import shutil
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    raw = mock.rename(columns={
+        'country_of_origin_abbr': 'OriginISO', 'country_of_origin_name': 'OriginName', 'country_of_asylum_abbr': 'AsylumISO',
+        'country_of_asylum_name': 'AsylumName', 'region_of_asylum': 'AsylumRegion', 'category': 'PT', 'year': 'Year', 'count': 'Count'
+    }).assign(origin='', asylum='')
+    source_path = str(tmp_path / 'asylum.csv')
+    raw.to_csv(source_path, index=False)
+    years = range(1990, 2001)
+    expected = mock[mock['year'].isin(years)].sort_values('year', kind='stable').reset_index(drop=True)
+
+    for mode in ['partitions', 'table']:
+        folder = f"{tmp_path}{os.sep}{mode}{os.sep}"
+        os.makedirs(folder)
+        shutil.copy('test\\utils\\mock_data_population.csv', f"{folder}Population_data.csv")
+        cleaner = Cleaner(folder)
+        if mode == 'partitions':
+            cleaner.Update_asylum_seekers_clean_data(source_path, 500)
+        else:
+            cleaner.Output_asylum_seekers_clean_data(source_path, 500)
+
+        data_class = Data(data_folder=folder, years=years)
+        asylum_data = data_class.asylum_data.sort_values('year', kind='stable').reset_index(drop=True)
+        pd.testing.assert_frame_equal(asylum_data.fillna(''), expected.fillna(''))
+        # the views are computed from the loaded years
+        assert data_class.Get_year_timeline()['year'].tolist() == sorted(expected['year'].unique())
+        assert data_class.Get_data_token() != Data(data_folder=folder).Get_data_token()
+
+def test_Get_rows_of():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    mock.loc[3, 'country_of_origin_abbr'] = None
+    data_class = Data()
+    data_class.asylum_data = mock
+
+    for country in ['AFG', 'AGO', 'SYR', 'XXX']:
+        for column in ['country_of_origin_abbr', 'country_of_asylum_abbr']:
+            pd.testing.assert_frame_equal(data_class.Get_rows_of(country, column), mock[mock[column] == country])
+    by_origin_year = data_class.Get_aggregate_view('by_origin_year')
+    pd.testing.assert_frame_equal(data_class.Get_rows_of('AFG', 'country_of_origin_abbr', 'by_origin_year'),
+                                  by_origin_year[by_origin_year['country_of_origin_abbr'] == 'AFG'])
+
+def test_Get_ready_for_plot_all():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class = Data()
+    data_class.asylum_data = mock
+    origins = mock['country_of_origin_abbr'].unique()
+    expected = {origin: data_class.Get_ready_for_plot_df(origin) for origin in origins}
+
+    result = data_class.Get_ready_for_plot_all()
+
+    assert set(result) == set(origins)
+    for origin in origins:
+        pd.testing.assert_frame_equal(result[origin], expected[origin])
+
+    # once the batch is built the origins are read from it
+    builds = []
+    build = data_class._Data__Build_ready_for_plot_df
+    data_class._Data__Build_ready_for_plot_df = lambda origin: builds.append(origin) or build(origin)
+    data_class.query_cache.clear()
+    for origin in origins:
+        assert data_class.Get_ready_for_plot_df(origin) is result[origin]
+    assert builds == []
+    data_class.Get_ready_for_plot_df('XXX')
+    assert builds == ['XXX']
+
+
+def test_Get_country_summary():
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class = Data()
+    data_class.asylum_data = mock
+    origin_codes = data_class.Get_origin_codes()
+
+    for name, code in mock[['country_of_origin_name', 'country_of_origin_abbr']].drop_duplicates().itertuples(index=False):
+        assert origin_codes[name] == code
+
+    code = mock['country_of_origin_abbr'].iloc[0]
+    summary = data_class.Get_country_summary(code)
+    crisis_windows = data_class.Get_crisis_windows()
+    crisis_windows = crisis_windows[(crisis_windows['type'] == 'origin') & (crisis_windows['country'] == code)]
+
+    pd.testing.assert_frame_equal(summary['ready_for_plot'], data_class.Get_ready_for_plot_df(code))
+    pd.testing.assert_frame_equal(summary['timeline'], data_class.Get_total_country_migration_df(code))
+    assert summary['crisis_windows'].to_dict('records') == crisis_windows[['start', 'end']].to_dict('records')
+    # both graphs of a selection share the same result
+    assert data_class.Get_country_summary(code) is summary
+
+
+def test_memmap(tmp_path):
+    import numpy as np
+    import os
+    folder = f"{tmp_path}{os.sep}"
+    data_class = Data()
+    data_class.asylum_data = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class.population_data = pd.read_csv('test\\utils\\mock_data_population.csv')
+    data_class.Export_memmap(folder)
+
+    attached = Data(memmap_folder=folder)
+
+    pd.testing.assert_frame_equal(attached.asylum_data, Data.Compact_asylum_data(data_class.asylum_data))
+    pd.testing.assert_frame_equal(attached.population_data, data_class.population_data)
+    # the columns are read from the mapped files, not copied
+    def is_mapped(array):
+        while array is not None and not isinstance(array, np.memmap):
+            array = array.base if isinstance(array, np.ndarray) else None
+        return array is not None
+    assert is_mapped(attached.asylum_data['count'].to_numpy())
+    # the codes of the categorical itself, Series.cat.codes can be a copy
+    assert is_mapped(attached.asylum_data['country_of_origin_abbr'].array.codes)
+    assert is_mapped(attached.population_data['1990'].to_numpy())
+    for name in Data.AGGREGATE_VIEWS:
+        pd.testing.assert_frame_equal(attached.Get_aggregate_view(name), Data.Compact_asylum_data(data_class.Get_aggregate_view(name)))
+    pd.testing.assert_frame_equal(attached.Get_year_timeline(), data_class.Get_year_timeline(), check_dtype=False)
+    # the sorted copies of Get_rows_of are mapped too
+    origin = data_class.asylum_data['country_of_origin_abbr'].iloc[0]
+    rows = attached.Get_rows_of(origin, 'country_of_origin_abbr')
+    pd.testing.assert_frame_equal(rows, attached.asylum_data[attached.asylum_data['country_of_origin_abbr'] == origin])
+    assert is_mapped(rows['count'].to_numpy())
+
+    # every export has its own files, the workers attached to the previous one keep reading it
+    data_class.asylum_data = data_class.asylum_data.assign(count=data_class.asylum_data['count'] + 1)
+    data_class.Export_memmap(folder)
+    pd.testing.assert_frame_equal(attached.asylum_data, Data.Compact_asylum_data(data_class.asylum_data.assign(count=data_class.asylum_data['count'] - 1)))
+    pd.testing.assert_frame_equal(Data(memmap_folder=folder).asylum_data, Data.Compact_asylum_data(data_class.asylum_data))
+    data_class.Export_memmap(folder)
+    # only the files of the last two exports are kept
+    assert len({file_name.split('.')[0] for file_name in os.listdir(folder) if file_name.endswith('.npy')}) == 2
+
+
+def test_memmap_missing_year(tmp_path):
+    import os
+    folder = f"{tmp_path}{os.sep}"
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    data_class = Data()
+    # the rows without year are kept by Cleaner in their own partition
+    data_class.asylum_data = pd.concat([mock, mock.head(3).assign(year=None)], ignore_index=True)
+    data_class.population_data = pd.read_csv('test\\utils\\mock_data_population.csv')
+    data_class.Export_memmap(folder)
+
+    attached = Data(memmap_folder=folder)
+
+    assert attached.asylum_data['year'].dtype == 'Int16'
+    pd.testing.assert_frame_equal(attached.asylum_data, Data.Compact_asylum_data(data_class.asylum_data))
+    for name in Data.AGGREGATE_VIEWS:
+        pd.testing.assert_frame_equal(attached.Get_aggregate_view(name), Data.Compact_asylum_data(data_class.Get_aggregate_view(name)))
+    origin = mock['country_of_origin_abbr'].iloc[0]
+    pd.testing.assert_frame_equal(attached.Get_rows_of(origin, 'country_of_origin_abbr'),
+                                  attached.asylum_data[attached.asylum_data['country_of_origin_abbr'] == origin])
+
+
+def test_Top_k():
+    import numpy as np
+    mock = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    totals = mock.groupby(['country_of_origin_name', 'year']).agg({'count': 'sum'}).reset_index()
+    # equal counts keep their order
+    totals.loc[totals.index[::7], 'count'] = 1_000
+
+    for k in [0, 1, 3, 20, len(totals) + 1, None]:
+        ranked = totals.sort_values('count', ascending=False, kind='stable')
+        pd.testing.assert_frame_equal(Data.Top_k(totals, 'count', k), ranked.head(len(totals) if k is None else k))
+        pd.testing.assert_frame_equal(Data.Top_k(totals, 'count', k, by='year'), ranked.groupby('year').head(len(totals) if k is None else k).sort_values('year', kind='stable'))
+
+    # missing values are never selected, like nlargest
+    with_missing = totals.assign(count=totals['count'].astype(float).where(totals.index % 5 != 0, np.nan))
+    pd.testing.assert_frame_equal(Data.Top_k(with_missing, 'count', 10), with_missing.nlargest(10, 'count'))
@@ -0,0 +1,52 @@
+from src.FigureCache import FigureCache
+import json
+import threading
+import plotly.graph_objects as go
+
+
+def test_get_or_create(tmp_path):
+    figure_cache = FigureCache(f"{tmp_path}/")
+    builds = []
+
+    def builder():
+        builds.append(1)
+        return go.Figure(go.Bar(x=[1990, 1991], y=[5, 7]))
+
+    first = figure_cache.get_or_create('country_map', 'Kenya', 'token', builder)
+    assert json.loads(first)['data'][0]['type'] == 'bar' and (figure_cache.hits, figure_cache.misses) == (0, 1)
+    second = figure_cache.get_or_create('country_map', 'Kenya', 'token', builder)
+
+    assert len(builds) == 1
+    # the JSON text as written, never parsed
+    assert second == first
+    assert (figure_cache.hits, figure_cache.misses) == (1, 1)
+
+    # other data, other figure
+    figure_cache.get_or_create('country_map', 'Kenya', 'new token', builder)
+    assert len(builds) == 2
+
+    # without token the data is unknown and nothing is cached
+    figure_cache.get_or_create('country_map', 'Kenya', None, builder)
+    figure_cache.get_or_create('country_map', 'Kenya', None, builder)
+    assert len(builds) == 4
+
+    figure_cache.clear()
+    assert figure_cache.get('country_map', 'Kenya', 'token') is None
+
+
+def test_counters_with_threads(tmp_path):
+    figure_cache = FigureCache(f"{tmp_path}/")
+    figure_cache.put('country_map', 'Kenya', 'token', go.Figure())
+
+    def read():
+        for _ in range(500):
+            figure_cache.get('country_map', 'Kenya', 'token')
+            figure_cache.get('country_map', 'Syria', 'token')
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (figure_cache.hits, figure_cache.misses) == (2000, 2000)
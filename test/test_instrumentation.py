@@ -0,0 +1,49 @@
+from src.Instrumentation import Histogram, Instrumentation, instrumented, span
+import threading
+
+
+def test_Histogram():
+    histogram = Histogram(max_samples=100)
+    for value in range(1, 1_001):
+        histogram.record(value / 1_000)
+    summary = histogram.summary()
+
+    assert summary['count'] == 1_000
+    assert summary['max'] == 1.0
+    # the percentiles come from the last 100 samples, 0.901 to 1.0
+    assert 0.95 <= summary['p50'] <= 0.951
+    assert summary['p99'] <= 1.0
+
+
+def test_instrumented():
+    calls = []
+
+    @instrumented(name='test.function')
+    def function(value):
+        calls.append(value)
+        return value * 2
+
+    Instrumentation.Reset()
+    Instrumentation.Disable()
+    assert function(2) == 4
+    with span('test.block'):
+        pass
+    assert Instrumentation.Snapshot() == {}
+
+    Instrumentation.Enable()
+    try:
+        threads = [threading.Thread(target=lambda: [function(1) for _ in range(100)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with span('test.block'):
+            pass
+        snapshot = Instrumentation.Snapshot()
+    finally:
+        Instrumentation.Disable()
+        Instrumentation.Reset()
+
+    assert snapshot['test.function']['count'] == 400
+    assert snapshot['test.block']['count'] == 1
+    assert len(calls) == 401
@@ -0,0 +1,21 @@
+import os
+from src.Pipeline import main
+import pandas as pd
+
+
+def test_pipeline_exit_code(tmp_path):
+    raw = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv').rename(columns={
+        'country_of_origin_abbr': 'OriginISO', 'country_of_origin_name': 'OriginName', 'country_of_asylum_abbr': 'AsylumISO',
+        'country_of_asylum_name': 'AsylumName', 'region_of_asylum': 'AsylumRegion', 'category': 'PT', 'year': 'Year', 'count': 'Count'
+    })
+    raw['origin'] = raw['OriginName']
+    raw['asylum'] = raw['AsylumName']
+    source_path = str(tmp_path / 'asylum.csv')
+    raw.to_csv(source_path, index=False)
+    output_folder = f"{tmp_path}{os.sep}clean{os.sep}"
+
+    # the population source is missing, the asylum stage still runs but the pipeline fails
+    exit_code = main(['--asylum', source_path, '--population', str(tmp_path / 'missing.csv'), '--output', output_folder, '--chunk-size', '500'])
+
+    assert exit_code == 1
+    assert os.path.exists(f"{output_folder}Asylum_data.csv")
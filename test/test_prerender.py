@@ -0,0 +1,47 @@
+from src.Prerender import Prerenderer
+
+
+def test_Prerenderer():
+    rendered = []
+
+    def fail():
+        raise ValueError('no data')
+
+    tasks = [(f"country_map:{country}", lambda country=country: rendered.append(country)) for country in ['Syria', 'Ukraine', 'Afghanistan']]
+    tasks.insert(1, ('country_map:Atlantis', fail))
+    prerenderer = Prerenderer(tasks, workers=1, stats=lambda: {'figure_cache': {'hits': 0, 'misses': 3}})
+
+    assert prerenderer.Progress()['done'] == 0
+    assert prerenderer.start().join(timeout=10)
+
+    progress = prerenderer.Progress()
+    # one worker renders in the given order
+    assert rendered == ['Syria', 'Ukraine', 'Afghanistan']
+    assert (progress['total'], progress['done'], progress['percent']) == (4, 4, 100.0)
+    assert progress['failed'] == ['country_map:Atlantis']
+    assert not progress['running']
+    assert progress['figure_cache'] == {'hits': 0, 'misses': 3}
+
+
+def test_Prerenderer_stop():
+    prerenderer = Prerenderer([('task', lambda: None)] * 10, workers=2)
+    prerenderer.stop()
+
+    assert prerenderer.start().join(timeout=10)
+    assert prerenderer.Progress()['done'] == 0
+
+
+def test_dash_without_prerender():
+    import pandas as pd
+    import threading
+    from src.Data import Data
+    from src.Visualization import Visualization
+    data_class = Data()
+    data_class.asylum_data = pd.read_csv('test\\utils\\mock_data_for_top_countries.csv')
+    visualization = Visualization(data_class)
+
+    # notebooks and apps without figure cache render only the selected country
+    visualization.Specific_country_information_dash()
+
+    assert visualization.prerenderer is None
+    assert not any(thread.name.startswith('prerender-') for thread in threading.enumerate())
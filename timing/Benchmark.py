@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.Cleaner import Cleaner
+from src.Data import Data
+from src.Visualization import Visualization
+from timing.SyntheticData import DEFAULT_REAL_ROW_COUNT, Generate_asylum_data, Generate_population_data
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+DEFAULT_BASELINE = os.path.join('timing', 'baseline.json')
+REAL_ASYLUM_DATA = '.\\Data\\Clean\\Asylum_data.csv'
+
+
+class Sample:
+    """
+        Arguments used by the benchmark cases, picked from the generated data
+    """
+
+    def __init__(self, data: Data):
+        origin_totals = data.asylum_data.groupby('country_of_origin_abbr')['count'].sum().sort_values(ascending=False)
+        self.origin = origin_totals.index[0]
+        self.origin_name = data.abbr_dict[self.origin]
+        self.timeline = data.Get_total_country_migration_df(self.origin)
+        self.destination = data.Get_destination_by_year(self.origin)
+        self.years = data.Get_countries_and_years_df(self.destination)
+        self.panel = data.Destination_or_origin_by_year('origin', hover_text=False)
+        self.row = next(self.panel.itertuples())
+        self.period = f"{data.asylum_data['year'].max() - 5}-{data.asylum_data['year'].max()}"
+
+
+# name: function(data, visualization, sample)
+CASES = {
+    'Data.Peak_finder': lambda data, visualization, sample: list(data.Peak_finder(sample.timeline)),
+    'Data.Find_crisis_windows': lambda data, visualization, sample: data.Find_crisis_windows(sample.panel, 'country'),
+    'Data.Get_crisis_windows': lambda data, visualization, sample: data.Get_crisis_windows(),
+    'Data.top_origin_countries_yearly': lambda data, visualization, sample: data.top_origin_countries_yearly(1962, 2024),
+    'Data.Get_population_long': lambda data, visualization, sample: data.Get_population_long(),
+    'Data.Country_population_data': lambda data, visualization, sample: data.Country_population_data(sample.origin),
+    'Data.Get_country_population_df': lambda data, visualization, sample: data.Get_country_population_df(),
+    'Data.Get_destination_by_year': lambda data, visualization, sample: data.Get_destination_by_year(sample.origin),
+    'Data.Build_country_year_panel': lambda data, visualization, sample: data.Build_country_year_panel(sample.destination, 'country_of_asylum_abbr'),
+    'Data.Get_countries_and_years_df': lambda data, visualization, sample: data.Get_countries_and_years_df(sample.destination),
+    'Data.Merge_and_clean_df': lambda data, visualization, sample: data.Merge_and_clean_df(sample.destination, sample.years),
+    'Data.Get_ready_for_plot_df': lambda data, visualization, sample: data.Get_ready_for_plot_df(sample.origin),
+    'Data.Get_ready_for_plot_all': lambda data, visualization, sample: data.Get_ready_for_plot_all(),
+    'Data.Get_top_partners_index': lambda data, visualization, sample: data.Get_top_partners_index('origin'),
+    'Data.Add_hover_text': lambda data, visualization, sample: data.Add_hover_text(sample.panel, 'origin'),
+    'Data.inverse_df_result': lambda data, visualization, sample: data.inverse_df_result(sample.row, 'country_of_asylum_name', 'origin', sample.row.country),
+    'Data.Get_df_with_a_year_per_country': lambda data, visualization, sample: data.Get_df_with_a_year_per_country(sample.panel),
+    'Data.Destination_or_origin_by_year': lambda data, visualization, sample: data.Destination_or_origin_by_year('origin'),
+    'Data.Get_total_country_migration_df': lambda data, visualization, sample: data.Get_total_country_migration_df(sample.origin),
+    'Data.Get_origin_country_total': lambda data, visualization, sample: data.Get_origin_country_total(),
+    'Data.Get_year_timeline': lambda data, visualization, sample: data.Get_year_timeline(),
+    'Data.Get_grouped_by_year_countries_total_origin': lambda data, visualization, sample: list(data.Get_grouped_by_year_countries_total_origin()),
+    'Data.Get_destination_countries': lambda data, visualization, sample: data.Get_destination_countries(),
+    'Data.Get_biggest_population_displacement_df': lambda data, visualization, sample: data.Get_biggest_population_displacement_df(),
+    'Data.Get_aggregate_view': lambda data, visualization, sample: data.Get_aggregate_view('by_origin_asylum_year'),
+    'Data.Top_k': lambda data, visualization, sample: data.Top_k(data.asylum_data, 'count', 3, by='year'),
+    'Data.Compact_asylum_data': lambda data, visualization, sample: data.Compact_asylum_data(data.asylum_data),
+    'Visualization.Country_of_origin': lambda data, visualization, sample: visualization.Country_of_origin(),
+    'Visualization.Asylum_seekers_timeline': lambda data, visualization, sample: visualization.Asylum_seekers_timeline(),
+    'Visualization.Destination_countries_graph': lambda data, visualization, sample: visualization.Destination_countries_graph(),
+    'Visualization.Biggest_displacement_percentage_graph': lambda data, visualization, sample: visualization.Biggest_displacement_percentage_graph(),
+    'Visualization.Crisis_period_graph': lambda data, visualization, sample: visualization.Crisis_period_graph(sample.period),
+    'Visualization.Country_destinations_map': lambda data, visualization, sample: visualization.Country_destinations_map(sample.origin_name),
+    'Visualization.Country_timeline_graph': lambda data, visualization, sample: visualization.Country_timeline_graph(sample.origin_name),
+    'Visualization.Migration_crisis_by_period_Dash': lambda data, visualization, sample: visualization.Migration_crisis_by_period_Dash(),
+    'Visualization.Specific_country_information_dash': lambda data, visualization, sample: visualization.Specific_country_information_dash(),
+    'Visualization.Get_origin_and_destination_graphs': lambda data, visualization, sample: visualization.Get_origin_and_destination_graphs(),
+}
+
+
+def Real_row_count() -> int:
+    """
+        Rows of the clean asylum data, used as scale 1, DEFAULT_REAL_ROW_COUNT when the file is not there
+    """
+    if not os.path.exists(REAL_ASYLUM_DATA):
+        return DEFAULT_REAL_ROW_COUNT
+    with open(REAL_ASYLUM_DATA, encoding='utf-8') as file:
+        return sum(1 for _ in file) - 1
+
+
+def Load_synthetic_data(rows: int, folder: str, seed: int = 0) -> Data:
+    """
+        Writes generated clean data and its aggregate views to a folder and loads it with Data, as the dashboards would
+    """
+    tables = {'Asylum_data': Generate_asylum_data(rows, seed=seed), 'Population_data': Generate_population_data(seed=seed)}
+    for name, table in tables.items():
+        if pyarrow is not None:
+            table.to_feather(os.path.join(folder, f"{name}.feather"))
+        else:
+            table.to_csv(os.path.join(folder, f"{name}.csv"), index=False)
+    cleaner = Cleaner(folder + os.sep)
+    cleaner.Output_aggregate_views(tables['Asylum_data'])
+    data = Data(data_folder=folder + os.sep)
+    # like the names Data adds by hand, the generated destinations are not all origins
+    asylum_names = tables['Asylum_data'][['country_of_asylum_abbr', 'country_of_asylum_name']].drop_duplicates('country_of_asylum_abbr')
+    for abbr, name in asylum_names.itertuples(index=False):
+        data.abbr_dict.setdefault(abbr, name)
+    return data
+
+
+def Measure(case: 'Case', repeat: int) -> dict:
+    """
+        Runs a case with cold caches, repeat times for the time and once more under tracemalloc for the peak memory
+
+        Returns:
+            dict with median seconds, minimum seconds and peak bytes
+    """
+    times = []
+    for _ in range(repeat):
+        case.reset()
+        start = time.perf_counter()
+        case()
+        times.append(time.perf_counter() - start)
+
+    case.reset()
+    tracemalloc.start()
+    case()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'peak_bytes': peak}
+
+
+class Case:
+    """
+        A benchmark case bound to its data, reset drops every cached result so each run is cold, the views are still read from their files
+    """
+
+    def __init__(self, function, data: Data, visualization: Visualization, sample: Sample):
+        self.function = function
+        self.data = data
+        self.visualization = visualization
+        self.sample = sample
+
+    def reset(self) -> None:
+        self.data.Clear_caches()
+
+    def __call__(self):
+        return self.function(self.data, self.visualization, self.sample)
+
+
+def Run(scales: list, repeat: int, case_names: list, seed: int = 0, base_rows: int = None) -> dict:
+    """
+        Runs the cases at every scale
+
+        Returns:
+            dict 'scale:case' -> measure
+    """
+    results = {}
+    base_rows = base_rows or Real_row_count()
+    for scale in scales:
+        rows = int(base_rows * scale)
+        with tempfile.TemporaryDirectory() as folder:
+            data = Load_synthetic_data(rows, folder, seed)
+            visualization = Visualization(data)
+            sample = Sample(data)
+            for name in case_names:
+                result = Measure(Case(CASES[name], data, visualization, sample), repeat)
+                result['rows'] = rows
+                results[f"{scale}x:{name}"] = result
+                print(f"{scale:>5}x {name:<55} {result['seconds'] * 1000:>11.1f} ms {result['peak_bytes'] / 2**20:>9.1f} MB", flush=True)
+    return results
+
+
+def Compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+        Finds the cases slower or using more memory than the baseline times tolerance, cases measured on another number of rows are not compared
+
+        Returns:
+            list of str describing every regression
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline or baseline[key].get('rows', result.get('rows')) != result.get('rows'):
+            continue
+        for metric in ['seconds', 'peak_bytes']:
+            ratio = result[metric] / baseline[key][metric] if baseline[key][metric] else 1
+            if ratio > tolerance:
+                regressions.append(f"{key} {metric}: {baseline[key][metric]:.4g} -> {result[metric]:.4g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    """
+        Usage: python -m timing.Benchmark [--scales 1 10 100] [--base-rows N] [--repeat 3] [--cases NAME ...] [--save-baseline] [--baseline PATH]
+    """
+    parser = argparse.ArgumentParser(description='Times every Data method and Visualization figure on generated data')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100], help='multiples of the real row count')
+    parser.add_argument('--base-rows', type=int, default=None, help='rows of scale 1, the rows of the clean asylum data by default')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the median is reported')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES), metavar='CASE', help='cases to run, all by default')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file to compare with or to save')
+    parser.add_argument('--save-baseline', action='store_true', help='stores the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='ratio over the baseline reported as a regression')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated data')
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) if float(scale).is_integer() else scale for scale in args.scales]
+    results = Run(scales, args.repeat, args.cases, args.seed, args.base_rows)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, nothing compared, run with --save-baseline to create it")
+        return 0
+    with open(args.baseline, encoding='utf-8') as file:
+        regressions = Compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
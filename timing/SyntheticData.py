@@ -0,0 +1,83 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+# rows used for scale 1 when there is no clean Asylum_data.csv to measure
+DEFAULT_REAL_ROW_COUNT = 130_000
+FIRST_YEAR = 1962
+LAST_YEAR = 2024
+CATEGORIES = ['Refugee', 'Asylum-seekers', 'People in refugee-like situation', 'Other people in need of international protection']
+REGIONS = ['Asia and the Pacific', 'East and Horn of Africa and Great Lakes', 'Europe', 'Middle East and North Africa', 'Southern Africa',
+           'The Americas', 'West and Central Africa']
+
+
+def Country_codes(amount: int) -> list:
+    """
+        Generates ISO-3 like country codes, AAA, AAB, ...
+    """
+    return [''.join(letters) for letters in itertools.islice(itertools.product('ABCDEFGHIJKLMNOPQRSTUVWXYZ', repeat=3), amount)]
+
+
+def Generate_asylum_data(rows: int, countries: int = 200, seed: int = 0) -> pd.DataFrame:
+    """
+        Generates asylum data with the schema of the clean Asylum_data.csv.
+        Origins and destinations follow a skewed popularity, later years have more rows and counts are heavy tailed like the real data.
+
+        Args:
+            rows (int): number of rows
+            countries (int): number of countries used as origin and asylum
+            seed (int): seed of the random generator, the same seed gives the same data
+
+        Returns:
+            pandas.DataFrame with the clean asylum data columns
+    """
+    generator = np.random.default_rng(seed)
+    codes = np.array(Country_codes(countries))
+    names = np.array([f"Country {code}" for code in codes])
+    regions = np.array(REGIONS)[np.arange(countries) % len(REGIONS)]
+
+    popularity = 1 / np.arange(1, countries + 1) ** 0.8
+    popularity /= popularity.sum()
+    origin = generator.choice(countries, rows, p=popularity)
+    asylum = generator.choice(countries, rows, p=generator.permutation(popularity))
+    # nobody asks asylum in their own country
+    asylum = np.where(asylum == origin, (asylum + 1) % countries, asylum)
+
+    years = np.arange(FIRST_YEAR, LAST_YEAR + 1)
+    year_weights = np.linspace(1, 10, len(years))
+    year = generator.choice(years, rows, p=year_weights / year_weights.sum())
+
+    return pd.DataFrame({
+        'country_of_origin_abbr': codes[origin],
+        'country_of_origin_name': names[origin],
+        'country_of_asylum_abbr': codes[asylum],
+        'country_of_asylum_name': names[asylum],
+        'region_of_asylum': regions[asylum],
+        'category': np.array(CATEGORIES)[generator.choice(len(CATEGORIES), rows, p=[0.6, 0.3, 0.07, 0.03])],
+        'year': year.astype(np.int64),
+        'count': np.maximum(1, generator.pareto(1.1, rows) * 20).astype(np.int64)
+    })
+
+
+def Generate_population_data(countries: int = 200, seed: int = 0) -> pd.DataFrame:
+    """
+        Generates population data with the schema of the clean Population_data.csv for the countries of Generate_asylum_data
+
+        Args:
+            countries (int): number of countries
+            seed (int): seed of the random generator
+
+        Returns:
+            pandas.DataFrame with Country Name, Country Code and one column per year from 1960 to 2023
+    """
+    generator = np.random.default_rng(seed)
+    codes = Country_codes(countries)
+    years = [str(year) for year in range(1960, LAST_YEAR)]
+    start = generator.lognormal(15, 1.5, countries)
+    growth = 1 + generator.normal(0.015, 0.01, countries)
+    population = start[:, None] * growth[:, None] ** np.arange(len(years))[None, :]
+
+    data = pd.DataFrame(population, columns=years)
+    data.insert(0, 'Country Code', codes)
+    data.insert(0, 'Country Name', [f"Country {code}" for code in codes])
+    return data